@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from fem_python import config
+
+# The names of the checkpoints in the checkpoint directory, e.g. step_000180.
+_CHECKPOINT_NAME = re.compile(r"^step_(\d+)$")
+
+# The arguments of the simulation that a checkpoint belongs to. A checkpoint can only be loaded
+# by a simulation with the same values.
+_SIMULATION_PARAMETERS = [
+    "material_model_name",
+    "elasticity_module",
+    "poission_ratio",
+    "prescribed_displacement_x",
+    "num_time_steps",
+    "load_stepping_name",
+]
+
+
+class Checkpointer:
+    """Writes a checkpoint of a simulation every frequency time steps, to checkpoint_dir.
+    Only the last num_kept checkpoints are kept. It is added as a step callback of a simulation:
+        simulation.add_step_callback(Checkpointer("outputs/checkpoints"))
+
+    See write_checkpoint for the format of a checkpoint, and load_latest_checkpoint for restarting.
+    """
+
+    def __init__(self, checkpoint_dir, frequency=None, num_kept=None):
+        self.checkpoint_dir = checkpoint_dir
+        self.frequency = config.checkpoint_frequency if frequency is None else frequency
+        self.num_kept = config.num_checkpoints_kept if num_kept is None else num_kept
+
+    def __call__(self, simulation):
+        if simulation.time_step % self.frequency != 0:
+            return
+
+        write_checkpoint(simulation, self.checkpoint_dir)
+
+        for time_step in _list_checkpoints(self.checkpoint_dir)[: -self.num_kept]:
+            shutil.rmtree(_get_checkpoint_path(self.checkpoint_dir, time_step))
+
+
+def write_checkpoint(simulation, checkpoint_dir):
+    """Writes the state of the simulation at the end of its current time step to
+    <checkpoint_dir>/step_<time step>. This is everything that the next time steps depend on:
+        total_displacement_vec and internal_force_vec.
+        the committed material state, one array per quantity (e.g. stress) with the format of ExGx... .
+        the force displacement curve at the right boundary so far.
+        the time step, the load factor, the increment of the load factor of the load stepping,
+        a hash of the mesh and the arguments of the simulation, in meta.json.
+
+    Each array is a .npy file, i.e. its raw data after a small header. So, writing a checkpoint costs
+    about as much as copying the arrays, and nothing is pickled. The checkpoint is written to a
+    temporary directory first, and then renamed. Renaming is atomic. So, an interrupted write
+    never leaves a checkpoint that looks complete.
+    """
+    path = _get_checkpoint_path(checkpoint_dir, simulation.time_step)
+    tmp_path = path + ".tmp"
+
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    arrays = {
+        "total_displacement_vec": simulation.total_displacement_vec,
+        "internal_force_vec": simulation.internal_force_vec,
+        "force": np.array(simulation.force_displacement_right_boundary["force"]),
+        "displacement": np.array(
+            simulation.force_displacement_right_boundary["displacement"]
+        ),
+    }
+    for name, value in simulation.material_state.committed.items():
+        arrays["state_" + name] = value
+
+    for name, value in arrays.items():
+        np.save(os.path.join(tmp_path, name + ".npy"), value)
+
+    meta = {
+        "time_step": simulation.time_step,
+        "load_factor": simulation.load_factor,
+        "load_factor_increment": simulation.load_stepping.load_factor_increment,
+        "num_nodes": simulation.fem_mesh.num_nodes,
+        "num_elements": simulation.fem_mesh.num_elements,
+        "mesh_hash": _hash_mesh(simulation.fem_mesh),
+        "parameters": _get_simulation_parameters(simulation),
+    }
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # A checkpoint of the same time step, e.g. of an earlier run, is replaced.
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_checkpoint(simulation, path):
+    """Sets the state of the simulation to the one in the checkpoint at path. Then, simulation.resume()
+    runs the remaining time steps. Raises ValueError if the checkpoint belongs to a different simulation.
+
+    The arrays are memory mapped and copied into the arrays of the simulation, which the
+    next time steps modify in place.
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+
+    # Meshes with the same number of nodes and elements can still differ, e.g. in their coordinates
+    # or numbering. So, the mesh arrays themselves are compared, through their hash.
+    if meta["mesh_hash"] != _hash_mesh(simulation.fem_mesh) or meta[
+        "parameters"
+    ] != _get_simulation_parameters(simulation):
+        raise ValueError(
+            f"The checkpoint {path} was written by a simulation with a different mesh or arguments."
+        )
+
+    def load(name):
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+    simulation.reset()
+
+    simulation.total_displacement_vec[...] = load("total_displacement_vec")
+    simulation.internal_force_vec[...] = load("internal_force_vec")
+    for name, value in simulation.material_state.committed.items():
+        value[...] = load("state_" + name)
+
+    simulation.force_displacement_right_boundary = {
+        "force": load("force").tolist(),
+        "displacement": load("displacement").tolist(),
+    }
+    simulation.time_step = meta["time_step"]
+    simulation.load_factor = meta["load_factor"]
+    simulation.load_stepping.load_factor_increment = meta["load_factor_increment"]
+
+
+def load_latest_checkpoint(simulation, checkpoint_dir):
+    """Loads the checkpoint of the latest time step in checkpoint_dir, see load_checkpoint.
+    Returns False if there is no checkpoint."""
+    time_steps = _list_checkpoints(checkpoint_dir)
+    if not time_steps:
+        return False
+
+    load_checkpoint(simulation, _get_checkpoint_path(checkpoint_dir, time_steps[-1]))
+    return True
+
+
+def _get_simulation_parameters(simulation):
+    # The values go through json, so that they compare equal to the ones that are read back.
+    return json.loads(
+        json.dumps({name: getattr(simulation, name) for name in _SIMULATION_PARAMETERS})
+    )
+
+
+def _hash_mesh(fem_mesh):
+    """The sha256 of the node coordinates, the connectivity matrix and, if the mesh is renumbered,
+    the node order."""
+    arrays = [fem_mesh.node_coords, fem_mesh.connectivity_matrix]
+    if fem_mesh.node_order is not None:
+        arrays.append(fem_mesh.node_order)
+
+    sha256 = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        sha256.update(f"{array.dtype.str}{array.shape}".encode())
+        sha256.update(array.tobytes())
+    return sha256.hexdigest()
+
+
+def _get_checkpoint_path(checkpoint_dir, time_step):
+    return os.path.join(checkpoint_dir, f"step_{time_step:06d}")
+
+
+def _list_checkpoints(checkpoint_dir):
+    """The time steps of the complete checkpoints in checkpoint_dir, in increasing order."""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+
+    time_steps = []
+    for name in os.listdir(checkpoint_dir):
+        match = _CHECKPOINT_NAME.match(name)
+        if match:
+            time_steps.append(int(match.group(1)))
+
+    return sorted(time_steps)
@@ -1,6 +1,18 @@
 num_time_steps = 5
 max_num_nr_iterations = 10
 
+# "fixed" applies the prescribed displacement in num_time_steps equal time steps.
+# "adaptive" starts with the same time step. When the Newton method converges within fast_convergence_iterations
+# iterations, the next time step is step_growth_factor times larger. When it fails, the time step is retried
+# step_cutback_factor times smaller. The increment of the load factor (the applied fraction of the prescribed
+# displacement) stays between min_load_factor_increment and max_load_factor_increment.
+load_stepping_name = "fixed"
+step_growth_factor = 1.5
+step_cutback_factor = 0.5
+fast_convergence_iterations = 4
+min_load_factor_increment = 1e-4
+max_load_factor_increment = 0.5
+
 material_model_name = "nonlinear_elastic"
 bar_elasticity_module = 1
 bar_poission_ratio = 0
@@ -8,11 +20,79 @@ plane_stress = False
 
 element_type = "Q4"
 mesh_file_path = "meshes/1d_bar.msh"
+# If set, e.g. (100, 100), a structured mesh of the unit square with this number of elements in x and y
+# is made in memory instead of reading mesh_file_path.
+structured_mesh_size = None
+# Keep the arrays of the msh file in a binary cache (<mesh_file_path>.cache) to skip parsing it at the next runs.
+mesh_cache = True
+# Renumber the nodes with reverse Cuthill-McKee to reduce the bandwidth of the stiffness matrix.
+renumber_nodes = False
 
 right_boundary_node_tag = 11
 left_boundary_node_tag = 12
 bottom_boundary_node_tag = 13
 
+# Boundary groups of the mesh, made of the lines with the given physical tag.
+# More groups can be added. The boundary conditions use "left", "right" and "bottom".
+boundary_tags = {
+    "right": right_boundary_node_tag,
+    "left": left_boundary_node_tag,
+    "bottom": bottom_boundary_node_tag,
+}
+
 prescribed_displacement_at_right_boundary_x = 15
 
+# The force displacement curve is shown in a window ("show"), saved to plot_file_path ("save"),
+# e.g. for batch runs without a display, or not plotted ("none").
+plot_mode = "show"
+plot_file_path = "outputs/force_displacement.png"
+
+# If set, the fields at nodes are written to this XDMF file during the simulation, with the data in an
+# HDF5 file next to it (requires h5py). Every output_frequency-th time step and the last one are written.
+# The datasets are gzip compressed with output_compression_level (0 turns compression off).
+time_series_file_path = None
+output_frequency = 1
+output_compression_level = 4
+# If True, the time steps are written on a background thread, while the simulation goes on.
+# At most output_queue_size time steps wait to be written. When the queue is full, the simulation waits.
+async_output = True
+output_queue_size = 2
+
+# If set, a checkpoint of the simulation is written to this directory every checkpoint_frequency time steps.
+# Only the last num_checkpoints_kept checkpoints are kept. With restart = True, the simulation starts
+# from the latest checkpoint in the directory, if there is one.
+checkpoint_dir = None
+checkpoint_frequency = 10
+num_checkpoints_kept = 2
+restart = False
+
 num_integration_points = 2
+
+# "sparse" assembles the stiffness matrix in the CSR format. "dense" is only meant for debugging tiny meshes.
+assembly_mode = "sparse"
+# Number of threads that the elements are split over during assembly.
+num_assembly_threads = 1
+
+# "superlu" (sparse LU), "cholmod" (sparse Cholesky, requires scikit-sparse), "dense",
+# or the iterative solvers "cg" and "minres"
+solver_name = "superlu"
+
+# Settings of the iterative solvers.
+# The preconditioner is "jacobi", "ilu" or "amg" (requires pyamg).
+preconditioner_name = "jacobi"
+# The relative tolerance follows the Newton residual (inexact Newton) within these bounds.
+max_linear_rtol = 1e-1
+min_linear_rtol = 1e-10
+# Use the solution of the previous Newton iteration as the initial guess.
+warm_start = True
+
+# "elimination" keeps the constrained dofs in the system, with zero rows and columns and 1 on the diagonal.
+# "condensation" removes them from the system and only solves for the free dofs.
+dirichlet_method = "elimination"
+
+# "full_newton", "modified_newton", "initial_stiffness" or "bfgs"
+nonlinear_strategy_name = "full_newton"
+# modified_newton and bfgs reuse a factorization for at most max_stiffness_reuse iterations,
+# or until the residual decreases by less than max_convergence_rate in an iteration.
+max_stiffness_reuse = 5
+max_convergence_rate = 0.5
@@ -1,4 +1,16 @@
-from .stiffness_matrix import make_stiffness_matrix_and_internal_force_vector
-from .solver import solve
-from .boundary_conditions import apply_dirichlet_boundary_condition
+from .stiffness_matrix import (
+    make_stiffness_matrix_and_internal_force_vector,
+    make_internal_force_vector,
+)
+from .solver import solve, get_solver
+from .boundary_conditions import (
+    apply_dirichlet_boundary_condition,
+    apply_dirichlet_boundary_condition_to_residual,
+    condense_dirichlet_boundary_condition,
+    expand_free_displacement,
+    get_constrained_dofs,
+)
 from .material_model import get_material_model
+from .material_state import MaterialStateStore
+from .nonlinear_strategy import get_nonlinear_strategy
+from .load_stepping import get_load_stepping
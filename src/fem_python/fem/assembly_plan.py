@@ -0,0 +1,135 @@
+import numpy as np
+from scipy import sparse
+
+from fem_python.mesh.mesh import FEMMesh
+
+
+class AssemblyPlan:
+    """The sparsity pattern of the stiffness matrix only depends on the connectivity matrix,
+    which does not change during the run. So, we work out once where each entry of each element
+    stiffness matrix goes in the global stiffness matrix.
+
+    The global stiffness matrix is stored in the CSR format: indptr, indices and data.
+    indptr and indices define the sparsity pattern, and are computed here. data holds the values,
+    and is the only thing that is computed at each Newton iteration. The slot map tells us for each
+    entry of each element stiffness matrix, which entry of data it is added to.
+    """
+
+    def __init__(self, fem_mesh: FEMMesh):
+        self.num_dofs = fem_mesh.num_nodes * 2
+
+        # Each node has two dofs, ux and uy. The dofs of an element are ordered as
+        # [ux_1, uy_1, ux_2, uy_2, ...], consistent with the columns of the B matrix.
+        nodes = np.asarray(fem_mesh.connectivity_matrix)
+        self.element_dofs = np.stack([2 * nodes, 2 * nodes + 1], axis=-1).reshape(
+            len(nodes), -1
+        )
+
+        num_element_dofs = self.element_dofs.shape[1]
+
+        # Entry (i, j) of the stiffness matrix of element e goes to
+        # (element_dofs[e, i], element_dofs[e, j]) of the global stiffness matrix.
+        self.rows = np.repeat(self.element_dofs, num_element_dofs, axis=1)
+        self.cols = np.tile(self.element_dofs, (1, num_element_dofs))
+
+        # Every (row, col) pair is turned into a single key. Sorting the unique keys gives us
+        # the entries row by row and, within each row, column by column. This is the CSR order.
+        keys = self.rows.ravel().astype(np.int64) * self.num_dofs + self.cols.ravel()
+        unique_keys, slot_map = np.unique(keys, return_inverse=True)
+
+        self.slot_map = slot_map.reshape(self.rows.shape)
+        self.nnz = len(unique_keys)
+
+        self.indices = (unique_keys % self.num_dofs).astype(np.int32)
+        self.indptr = np.zeros((self.num_dofs + 1,), dtype=np.int32)
+        np.cumsum(
+            np.bincount(unique_keys // self.num_dofs, minlength=self.num_dofs),
+            out=self.indptr[1:],
+        )
+
+    def assemble_matrix(self, element_matrices):
+        """element_matrices has the shape (num_elements, num_element_dofs, num_element_dofs)."""
+        return self.make_matrix(self.assemble_matrix_data(element_matrices))
+
+    def assemble_matrix_data(self, element_matrices, elements=slice(None)):
+        """Adds the element matrices up into the data of the CSR matrix. If elements is given,
+        element_matrices only holds those elements. Data of several groups of elements can be summed.
+        """
+        return np.bincount(
+            self.slot_map[elements].ravel(),
+            weights=element_matrices.ravel(),
+            minlength=self.nnz,
+        )
+
+    def make_matrix(self, data):
+        return sparse.csr_matrix(
+            (data, self.indices, self.indptr), shape=(self.num_dofs, self.num_dofs)
+        )
+
+    def assemble_dense_matrix(self, element_matrices):
+        matrix = np.zeros((self.num_dofs, self.num_dofs))
+        np.add.at(
+            matrix, (self.rows, self.cols), element_matrices.reshape(self.rows.shape)
+        )
+        return matrix
+
+    def assemble_vector(self, element_vectors, elements=slice(None)):
+        """element_vectors has the shape (num_elements, num_element_dofs). If elements is given,
+        element_vectors only holds those elements."""
+        return np.bincount(
+            self.element_dofs[elements].ravel(),
+            weights=element_vectors.ravel(),
+            minlength=self.num_dofs,
+        )
+
+
+def get_assembly_plan(fem_mesh: FEMMesh) -> AssemblyPlan:
+    """The assembly plan is made once per mesh and stored in the mesh cache."""
+    if "assembly_plan" not in fem_mesh.cache:
+        fem_mesh.cache["assembly_plan"] = AssemblyPlan(fem_mesh)
+
+    return fem_mesh.cache["assembly_plan"]
+
+
+class SparsityPattern:
+    """Remembers the sparsity pattern (indptr and indices) of a CSR or CSC matrix. Whatever only
+    depends on the pattern (e.g. a fill-reducing ordering or the map of a block of the matrix)
+    is worked out once, and only again when changed tells that the pattern is different.
+    """
+
+    def __init__(self):
+        self.indptr = None
+        self.indices = None
+
+    def changed(self, matrix):
+        """Returns True if the pattern of matrix differs from the one of the previous call
+        (or if it is the first call), and remembers the pattern of matrix."""
+        if (
+            self.indptr is not None
+            and np.array_equal(self.indptr, matrix.indptr)
+            and np.array_equal(self.indices, matrix.indices)
+        ):
+            return False
+
+        self.indptr = matrix.indptr.copy()
+        self.indices = matrix.indices.copy()
+        return True
+
+
+def make_submatrix_map(matrix, rows, cols, format="csr"):
+    """Works out matrix[rows][:, cols] of a CSR matrix, in the given format ("csr" or "csc"),
+    as a gather of the entries of matrix. Returns data_map, indices and indptr, such that the
+    submatrix of any matrix with the same pattern is
+        (matrix.data[data_map], indices, indptr)
+    rows and cols may also be permutations, e.g. to reorder the matrix.
+    """
+    # We put 1, 2, ..., nnz as values, extract the submatrix, and read back which entry
+    # each value comes from. 0 is avoided since zeros could be dropped as explicit zeros.
+    entry_ids = sparse.csr_matrix(
+        (np.arange(1, matrix.nnz + 1), matrix.indices, matrix.indptr),
+        shape=matrix.shape,
+    )
+    submatrix_ids = entry_ids[rows][:, cols].asformat(format)
+    submatrix_ids.sort_indices()
+
+    return submatrix_ids.data - 1, submatrix_ids.indices, submatrix_ids.indptr
@@ -1,94 +1,301 @@
 import numpy as np
+from scipy import sparse
 
 from fem_python.mesh import FEMMesh
+from fem_python.fem.assembly_plan import SparsityPattern, make_submatrix_map
 
 
-def apply_dirichlet_boundary_condition(
-    fem_mesh: FEMMesh, stiffness_mat, force_vec, displacement_step_x, iter_num
-):
+class ConstrainedDofs:
     """The constrains for a plate with hole problem is different that of the 1d bar.
     Since we are only considering a quarter of the plate, we need to apply the boundary conditions
     in a way that it sattisfies the symmetry conditions. We constaints the left boundary in the x direction.
     And the bottom boundary in the y direction. The load is applied in the right boundary in the x direction.
+
+    The constrained dofs only depend on the boundaries of the mesh. So, we collect them once here:
+        prescribed_dofs: x dofs of the right boundary, where the load (displacement) is applied.
+        fixed_dofs: x dofs of the left boundary and y dofs of the bottom boundary, which are set to zero.
+        dofs: all constrained dofs, sorted.
+        free_dofs: all other dofs, sorted.
     """
 
-    elements = fem_mesh.boundary_connectivity_matrices["right"]
-
-    # The procedure of applying prescribed displacement is as follows:
-    # Let's say prescribed displacements are applied at dofs_p.
-    # Then, the system of equations can be written as following blocks:
-    # [[k_bb , kbp], [k_pb , kpp]] [u_b, u_p] = [f_b, f_p]
-    # if u_p is set to U, then system of equation can be written as:
-    # [[k_bb , 0], [1 , 1]] [u_b, u_p] = [f_b - kbp U, U]
-    # Note that by solving the above equation, u_p becomes U.
-    # The benefit of this formulation is that we do not change the dimnesion of the stiffness matrix.
-    dofs_ux = []
-    for nodes in elements:
-        for node in nodes:
-            dof_x = 2 * node
-            dofs_ux.append(dof_x)
-
-    if iter_num == 0:
-        # This is U, the prescribed_displacement at prescribed dofs
-        prescribed_displacement = np.ones((len(dofs_ux),)) * displacement_step_x
-
-        # This is f_b - kbp U. Note that we remove this values from all dofs in force_vec
-        # This is corrected by setting the f_p to U
-        force_vec -= np.dot(stiffness_mat[:, dofs_ux], prescribed_displacement)
-        force_vec[np.ix_(dofs_ux)] = displacement_step_x
-    else:
-        force_vec[np.ix_(dofs_ux)] = 0
+    def __init__(self, fem_mesh: FEMMesh):
+        self.num_dofs = fem_mesh.num_nodes * 2
+
+        boundary_dofs = fem_mesh.boundary_dofs
+
+        self.prescribed_dofs = boundary_dofs["right"][:, 0]
+        self.fixed_dofs = np.union1d(
+            boundary_dofs["left"][:, 0], boundary_dofs["bottom"][:, 1]
+        )
+
+        self.dofs = np.union1d(self.prescribed_dofs, self.fixed_dofs)
+
+        self.mask = np.zeros((self.num_dofs,), dtype=bool)
+        self.mask[self.dofs] = True
+        self.free_dofs = np.flatnonzero(~self.mask)
+
+        # A dof that is both prescribed and fixed is fixed.
+        self._is_prescribed = np.isin(self.dofs, self.prescribed_dofs) & ~np.isin(
+            self.dofs, self.fixed_dofs
+        )
+
+        self._pattern = SparsityPattern()
+        self._constrained_entries = None
+        self._diagonal_entries = None
+        self._free_block = None
+
+    def get_prescribed_displacement(self, displacement_step_x):
+        """Displacement of the constrained dofs, in the order of dofs."""
+        return np.where(self._is_prescribed, displacement_step_x, 0.0)
+
+    def get_constrained_entries(self, stiffness_mat):
+        """Returns two masks over the entries (data) of a CSR stiffness matrix: the entries in
+        a constrained row or column, and the diagonal entries of constrained dofs.
+
+        The masks only depend on the sparsity pattern, which is the same at every iteration.
+        So, they are kept and only recomputed if the pattern changes."""
+        self._update_pattern(stiffness_mat)
+
+        if self._constrained_entries is None:
+            rows = np.repeat(np.arange(self.num_dofs), np.diff(stiffness_mat.indptr))
+            cols = stiffness_mat.indices
+
+            self._constrained_entries = self.mask[rows] | self.mask[cols]
+            self._diagonal_entries = self.mask[rows] & (rows == cols)
 
-    stiffness_mat[np.ix_(dofs_ux), :] = 0
-    stiffness_mat[:, np.ix_(dofs_ux)] = 0
-    stiffness_mat[np.ix_(dofs_ux), np.ix_(dofs_ux)] = 1
+        return self._constrained_entries, self._diagonal_entries
 
-    elements = fem_mesh.boundary_connectivity_matrices["left"]
+    def get_free_stiffness_matrix(self, stiffness_mat):
+        """Returns K_ff, the block of the stiffness matrix with the rows and the columns of the free dofs.
 
-    for nodes in elements:
-        for node in nodes:
-            # Note each node has two degrees of freedom. dof_x, dof_y.
-            dof_x = 2 * node
+        For a CSR stiffness matrix, the pattern of K_ff and the entries of K it takes its values from
+        are worked out once (see make_submatrix_map). Afterwards, extracting K_ff is a gather.
+        """
+        if not sparse.issparse(stiffness_mat):
+            return stiffness_mat[np.ix_(self.free_dofs, self.free_dofs)]
 
-            stiffness_mat[dof_x, :] = 0
-            stiffness_mat[:, dof_x] = 0
-            stiffness_mat[dof_x, dof_x] = 1
+        stiffness_mat = sparse.csr_matrix(stiffness_mat)
+        self._update_pattern(stiffness_mat)
 
-            force_vec[dof_x] = 0
+        if self._free_block is None:
+            self._free_block = make_submatrix_map(
+                stiffness_mat, self.free_dofs, self.free_dofs
+            )
 
-    elements = fem_mesh.boundary_connectivity_matrices["bottom"]
+        data_map, indices, indptr = self._free_block
+        return sparse.csr_matrix(
+            (stiffness_mat.data[data_map], indices, indptr),
+            shape=(len(self.free_dofs), len(self.free_dofs)),
+        )
 
-    for nodes in elements:
-        for node in nodes:
-            # Note each node has two degrees of freedom. dof_x, dof_y.
-            dof_y = 2 * node + 1
+    def _update_pattern(self, stiffness_mat):
+        if self._pattern.changed(stiffness_mat):
+            self._constrained_entries = None
+            self._diagonal_entries = None
+            self._free_block = None
 
-            stiffness_mat[dof_y, :] = 0
-            stiffness_mat[:, dof_y] = 0
-            stiffness_mat[dof_y, dof_y] = 1
 
-            force_vec[dof_y] = 0
+def get_constrained_dofs(fem_mesh: FEMMesh) -> ConstrainedDofs:
+    """The constrained dofs are collected once per mesh and stored in the mesh cache."""
+    if "constrained_dofs" not in fem_mesh.cache:
+        fem_mesh.cache["constrained_dofs"] = ConstrainedDofs(fem_mesh)
 
-    # # To simulate the behavior of a 1D bar, we constaint only one node in the y direction.
-    # node = elements[0]
-    # dof_y = 2 * node + 1
+    return fem_mesh.cache["constrained_dofs"]
 
-    # stiffness_mat[dof_y, :] = 0
-    # stiffness_mat[:, dof_y] = 0
-    # stiffness_mat[dof_y, dof_y] = 1
 
-    # force_vec[dof_y] = 0
+def apply_dirichlet_boundary_condition(
+    fem_mesh: FEMMesh,
+    stiffness_mat,
+    force_vec,
+    displacement_step_x,
+    iter_num,
+    increment_displacement_vec=None,
+    debug=False,
+):
+    """Applies the boundary conditions (see ConstrainedDofs) to the stiffness matrix and the force vector.
+
+    The procedure of applying prescribed displacement is as follows:
+    Let's say prescribed displacements are applied at dofs_p.
+    Then, the system of equations can be written as following blocks:
+    [[k_bb , kbp], [k_pb , kpp]] [u_b, u_p] = [f_b, f_p]
+    if u_p is set to U, then system of equation can be written as:
+    [[k_bb , 0], [1 , 1]] [u_b, u_p] = [f_b - kbp U, U]
+    Note that by solving the above equation, u_p becomes U.
+    The benefit of this formulation is that we do not change the dimnesion of the stiffness matrix.
+    Fixed dofs are treated the same way, with U = 0.
+
+    If increment_displacement_vec is given, U is corrected by what has already been applied
+    in this time step. This is needed when the linear system is not solved exactly
+    (e.g. iterative solvers), otherwise the error at the constrained dofs is never corrected.
+
+    The given stiffness matrix is not modified, since it is still needed by
+    apply_dirichlet_boundary_condition_to_residual. The force vector is modified in place.
+    For a CSR stiffness matrix, zeroing rows and columns only changes values, not the
+    sparsity pattern. So, the constrained stiffness matrix shares the pattern of the given one.
+
+    With debug=True, the constrained system is printed, solved and its condition number is computed.
+    Only use it for tiny meshes.
+    """
+    constrained_dofs = get_constrained_dofs(fem_mesh)
+
+    constrained_increment = _get_constrained_increment(
+        constrained_dofs, displacement_step_x, iter_num, increment_displacement_vec
+    )
+    force_vec = _apply_to_force_vector(
+        constrained_dofs, stiffness_mat, force_vec, constrained_increment
+    )
 
-    print(stiffness_mat.round(1))
-    print(force_vec.round(1))
-    print(np.linalg.solve(stiffness_mat, force_vec).round(2))
-    print(np.linalg.cond(stiffness_mat))
+    if sparse.issparse(stiffness_mat):
+        stiffness_mat = sparse.csr_matrix(stiffness_mat)
+        constrained_entries, diagonal_entries = (
+            constrained_dofs.get_constrained_entries(stiffness_mat)
+        )
 
-    if iter_num == 2:
-        quit()
+        data = stiffness_mat.data.copy()
+        data[constrained_entries] = 0
+        data[diagonal_entries] = 1
+
+        stiffness_mat = sparse.csr_matrix(
+            (data, stiffness_mat.indices, stiffness_mat.indptr),
+            shape=stiffness_mat.shape,
+        )
+    else:
+        dofs = constrained_dofs.dofs
+
+        stiffness_mat = stiffness_mat.copy()
+        stiffness_mat[dofs, :] = 0
+        stiffness_mat[:, dofs] = 0
+        stiffness_mat[dofs, dofs] = 1
+
+    if debug:
+        dense_stiffness_mat = (
+            stiffness_mat.toarray() if sparse.issparse(stiffness_mat) else stiffness_mat
+        )
+        print(dense_stiffness_mat.round(1))
+        print(force_vec.round(1))
+        print(np.linalg.solve(dense_stiffness_mat, force_vec).round(2))
+        print(np.linalg.cond(dense_stiffness_mat))
 
     return stiffness_mat, force_vec
 
 
+def apply_dirichlet_boundary_condition_to_residual(
+    fem_mesh: FEMMesh,
+    stiffness_mat,
+    force_vec,
+    displacement_step_x,
+    increment_displacement_vec,
+):
+    """This is the counterpart of apply_dirichlet_boundary_condition for iterations that reuse
+    an earlier factorization of the stiffness matrix. Only the force vector is modified,
+    in the same way as apply_dirichlet_boundary_condition does.
+
+    stiffness_mat is the stiffness matrix (without boundary conditions) that the reused
+    factorization was made from. It is used for the kbp U term.
+    """
+    constrained_dofs = get_constrained_dofs(fem_mesh)
+
+    constrained_increment = _get_constrained_increment(
+        constrained_dofs, displacement_step_x, None, increment_displacement_vec
+    )
+
+    return _apply_to_force_vector(
+        constrained_dofs, stiffness_mat, force_vec, constrained_increment
+    )
+
+
+def condense_dirichlet_boundary_condition(
+    fem_mesh: FEMMesh,
+    stiffness_mat,
+    force_vec,
+    displacement_step_x,
+    increment_displacement_vec,
+    condense_stiffness=True,
+):
+    """This is an alternative to apply_dirichlet_boundary_condition. Instead of keeping the
+    constrained dofs in the system, they are removed from it (static condensation):
+    [[k_ff , k_fp], [k_pf , k_pp]] [u_f, u_p] = [f_f, f_p]
+    Since u_p is known (U), only the first block row is solved:
+    k_ff u_f = f_f - k_fp U
+    The system is smaller, and k_ff is symmetric positive definite if K is. So, it can be
+    solved with Cholesky (the cholmod solver).
+
+    U is corrected by what has already been applied in this time step, as in apply_dirichlet_boundary_condition.
+
+    If condense_stiffness is False (e.g. a factorization is reused), k_ff is not extracted and None is returned.
+    stiffness_mat is then the stiffness matrix that the reused factorization was made from.
+
+    Returns:
+        tuple: k_ff, f_f - k_fp U and U. Use expand_free_displacement to get the displacement of all dofs.
+    """
+    constrained_dofs = get_constrained_dofs(fem_mesh)
+
+    constrained_increment = _get_constrained_increment(
+        constrained_dofs, displacement_step_x, None, increment_displacement_vec
+    )
+    force_vec = _apply_to_force_vector(
+        constrained_dofs, stiffness_mat, force_vec, constrained_increment
+    )
+    free_force_vec = force_vec[constrained_dofs.free_dofs]
+
+    free_stiffness_mat = None
+    if condense_stiffness:
+        free_stiffness_mat = constrained_dofs.get_free_stiffness_matrix(stiffness_mat)
+
+    return free_stiffness_mat, free_force_vec, constrained_increment
+
+
+def expand_free_displacement(
+    fem_mesh: FEMMesh, free_displacement_vec, constrained_increment
+):
+    """Puts the displacement of the free dofs and of the constrained dofs together."""
+    constrained_dofs = get_constrained_dofs(fem_mesh)
+
+    displacement_vec = np.zeros((constrained_dofs.num_dofs,))
+    displacement_vec[constrained_dofs.free_dofs] = free_displacement_vec
+    displacement_vec[constrained_dofs.dofs] = constrained_increment
+
+    return displacement_vec
+
+
+def _get_constrained_increment(
+    constrained_dofs: ConstrainedDofs,
+    displacement_step_x,
+    iter_num,
+    increment_displacement_vec,
+):
+    """This is U, what the constrained dofs should move by in this iteration."""
+    prescribed_displacement = constrained_dofs.get_prescribed_displacement(
+        displacement_step_x
+    )
+
+    if increment_displacement_vec is not None:
+        # This is U minus what has already been applied at constrained dofs.
+        # At the first iteration, it is U. Afterwards, it is zero if the solves are exact.
+        return (
+            prescribed_displacement - increment_displacement_vec[constrained_dofs.dofs]
+        )
+    elif iter_num == 0:
+        return prescribed_displacement
+    else:
+        return np.zeros_like(prescribed_displacement)
+
+
+def _apply_to_force_vector(
+    constrained_dofs: ConstrainedDofs, stiffness_mat, force_vec, constrained_increment
+):
+    # This is f_b - kbp U. Note that we remove this values from all dofs in force_vec.
+    # This is corrected by setting the f_p to U.
+    # kbp U is computed as K u, where u is U at constrained dofs and zero elsewhere.
+    # This avoids slicing the columns of the stiffness matrix.
+    lifting_displacement = np.zeros_like(force_vec)
+    lifting_displacement[constrained_dofs.dofs] = constrained_increment
+
+    force_vec -= stiffness_mat @ lifting_displacement
+    force_vec[constrained_dofs.dofs] = constrained_increment
+
+    return force_vec
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,102 @@
+import numpy as np
+
+from fem_python.fem.integration import get_gauss_integration_setting
+from fem_python.fem.shape_functions import (
+    Q4ShapeFunction,
+    evaluate_b_and_jacob_determinant_batched,
+)
+from fem_python.mesh.mesh import FEMMesh
+from fem_python import config
+
+
+class ElementGeometry:
+    """In the small strain setting, B matrices and jacobian determinants only depend on the
+    undeformed node coordinates. They are the same at every Newton iteration of every time step.
+    So, we compute them once for all elements and integration points and keep them.
+
+    Attributes:
+        b (np.array): B matrices with the format of ExGx3x8.
+        jacob_det (np.array): jacobian determinants with the format of ExG.
+        integration_volume (np.array): jacob_det times the integration weights, with the format of ExG.
+        extrapolation_matrix (np.array): maps values at the integration points of an element to values
+                                         at its nodes, with the format of 4xG.
+    """
+
+    def __init__(self, fem_mesh: FEMMesh, num_integration_points, element_type):
+        self.integration_setting = num_integration_points
+        self.element_type = element_type
+
+        # Integration points are used to integrate stiffness matrices.
+        # Stiffness matrix consists of polynomial shap functions. Ideally,
+        # we would like to have a number of integration points that solve for the
+        # integral exactly.
+        integration_points = get_gauss_integration_setting(
+            num_int_points=num_integration_points
+        )
+        self.num_integration_points = len(integration_points)
+
+        # The FEM mesh is defined by a tables of node coordinates and a connectivity matrix.
+        # Indexing the node coordinates table with the connectivity matrix gives us the
+        # coordinates of the nodes of all elements at once, with the format of Ex4x2.
+        element_node_coords = fem_mesh.node_coords[fem_mesh.connectivity_matrix]
+
+        b, jacob_det = evaluate_b_and_jacob_determinant_batched(
+            element_node_coords,
+            [integration_point.point for integration_point in integration_points],
+            element_type,
+        )
+
+        weights = np.array(
+            [integration_point.weight for integration_point in integration_points]
+        )
+
+        self.b = np.ascontiguousarray(b)
+        self.jacob_det = np.ascontiguousarray(jacob_det)
+        self.integration_volume = np.ascontiguousarray(jacob_det * weights)
+
+        # A value that is known at the integration points (e.g. stress) is interpolated with the shape functions:
+        # value(point g) = sum_i N_i(point g) value(node i), or values_at_points = n_mat values_at_nodes, where
+        # n_mat has the format of Gx4. Inverting n_mat gives the values at the nodes from the values at the points.
+        # It only depends on the isoparametric coordinates. So, it is the same for all elements.
+        # With 2x2 points, n_mat is square and invertible. With a single point, the pseudo inverse gives the
+        # value at the point at all nodes.
+        n_mat = np.array(
+            [
+                Q4ShapeFunction._get_shape_functions_and_their_derivatives(
+                    integration_point.point
+                )[0]
+                for integration_point in integration_points
+            ]
+        )
+        self.extrapolation_matrix = np.linalg.pinv(n_mat)
+
+    def compute_strain(self, element_displacement, elements=slice(None)):
+        """Computes B u for all elements and integration points.
+
+        Args:
+            element_displacement (np.array): displacement of element dofs with the format of Ex8.
+            elements (slice): if given, element_displacement only holds these elements.
+
+        Returns:
+            np.array: strain with the format of ExGx3.
+        """
+        return np.einsum("egij,ej->egi", self.b[elements], element_displacement)
+
+
+def get_element_geometry(fem_mesh: FEMMesh) -> ElementGeometry:
+    """The element geometry is computed once per mesh and stored in the geometry cache of the mesh.
+    It is recomputed if the mesh invalidates its geometry, e.g. when node coordinates change,
+    or if the integration setting changes."""
+    geometry = fem_mesh.geometry_cache.get("element_geometry")
+
+    if (
+        geometry is None
+        or geometry.integration_setting != config.num_integration_points
+        or geometry.element_type != config.element_type
+    ):
+        geometry = ElementGeometry(
+            fem_mesh, config.num_integration_points, config.element_type
+        )
+        fem_mesh.geometry_cache["element_geometry"] = geometry
+
+    return geometry
@@ -0,0 +1,152 @@
+from abc import ABC, abstractmethod
+
+from fem_python import config
+
+
+class AbstractLoadStepping(ABC):
+    """This is an abstract class for the ways the prescribed displacement is split into time steps.
+
+    The load factor is the fraction of the prescribed displacement that is applied so far. It goes
+    from 0, the undeformed state, to 1. At each time step, the load stepping gives the increment of
+    the load factor. After the time step, it is told whether the Newton method converged:
+        fixed: applies the prescribed displacement in num_time_steps equal increments. If the Newton
+               method fails, the simulation fails.
+        adaptive: starts with the same increment. It grows the increment when the Newton method converges
+                  quickly, and cuts it back and retries the time step when the Newton method fails.
+    """
+
+    def __init__(self, num_time_steps):
+        self.num_time_steps = num_time_steps
+        self.reset()
+
+    def reset(self):
+        self.load_factor_increment = 1 / self.num_time_steps
+
+    def get_increment(self, load_factor):
+        return self.load_factor_increment
+
+    @abstractmethod
+    def is_finished(self, time_step, load_factor):
+        pass
+
+    def converged(self, num_iterations):
+        """Called after a time step converged in num_iterations Newton iterations."""
+        pass
+
+    @abstractmethod
+    def cut_back(self, attempted_increment):
+        """Called after the Newton method failed with the increment attempted_increment. Returns True if
+        the time step should be retried with a smaller increment, and False if the simulation should fail.
+        """
+        pass
+
+
+class FixedLoadStepping(AbstractLoadStepping):
+    def is_finished(self, time_step, load_factor):
+        # The number of time steps is counted, since adding up the increments is not exact.
+        return time_step >= self.num_time_steps
+
+    def cut_back(self, attempted_increment):
+        return False
+
+
+class AdaptiveLoadStepping(AbstractLoadStepping):
+    """After a time step that converged in at most fast_convergence_iterations Newton iterations, the
+    increment is multiplied by step_growth_factor. After a failed time step, it is multiplied by
+    step_cutback_factor and the time step is retried from the state at its begining. The increment stays
+    between min_load_factor_increment and max_load_factor_increment. If it would go below the minimum,
+    the simulation fails.
+
+    On the parts of the load path where the material behaves almost linearly, a few large time steps are
+    enough. Where it is strongly nonlinear, the time steps become as small as the Newton method needs.
+    """
+
+    def __init__(
+        self,
+        num_time_steps,
+        step_growth_factor=None,
+        step_cutback_factor=None,
+        fast_convergence_iterations=None,
+        min_load_factor_increment=None,
+        max_load_factor_increment=None,
+    ):
+        self.step_growth_factor = (
+            config.step_growth_factor
+            if step_growth_factor is None
+            else step_growth_factor
+        )
+        self.step_cutback_factor = (
+            config.step_cutback_factor
+            if step_cutback_factor is None
+            else step_cutback_factor
+        )
+        self.fast_convergence_iterations = (
+            config.fast_convergence_iterations
+            if fast_convergence_iterations is None
+            else fast_convergence_iterations
+        )
+        self.min_load_factor_increment = (
+            config.min_load_factor_increment
+            if min_load_factor_increment is None
+            else min_load_factor_increment
+        )
+        self.max_load_factor_increment = (
+            config.max_load_factor_increment
+            if max_load_factor_increment is None
+            else max_load_factor_increment
+        )
+
+        super().__init__(num_time_steps)
+
+    def reset(self):
+        super().reset()
+        self.load_factor_increment = min(
+            self.load_factor_increment, self.max_load_factor_increment
+        )
+
+    def get_increment(self, load_factor):
+        remaining = 1 - load_factor
+
+        # The last time step ends exactly at the prescribed displacement. If it would leave less than the
+        # smallest increment, it takes the rest too, instead of leaving a tiny time step for the end.
+        if remaining - self.load_factor_increment < self.min_load_factor_increment:
+            return remaining
+
+        return self.load_factor_increment
+
+    def is_finished(self, time_step, load_factor):
+        return load_factor >= 1 - 1e-12
+
+    def converged(self, num_iterations):
+        if num_iterations <= self.fast_convergence_iterations:
+            self.load_factor_increment = min(
+                self.load_factor_increment * self.step_growth_factor,
+                self.max_load_factor_increment,
+            )
+
+    def cut_back(self, attempted_increment):
+        # The attempted increment may be smaller than load_factor_increment, e.g. at the last time step.
+        # The cut back starts from it, otherwise the same increment would be attempted again.
+        load_factor_increment = (
+            min(self.load_factor_increment, attempted_increment)
+            * self.step_cutback_factor
+        )
+
+        if load_factor_increment < self.min_load_factor_increment:
+            return False
+
+        self.load_factor_increment = load_factor_increment
+        return True
+
+
+def get_load_stepping(load_stepping_name, num_time_steps) -> AbstractLoadStepping:
+    if load_stepping_name == "fixed":
+        return FixedLoadStepping(num_time_steps)
+
+    elif load_stepping_name == "adaptive":
+        return AdaptiveLoadStepping(num_time_steps)
+
+    else:
+        raise NotImplementedError(
+            f"Load stepping {load_stepping_name} is not implemented."
+        )
@@ -19,27 +19,98 @@ class AbstractMaterialModel(ABC):
 
     There is a function to get the elastic stiffness matrix. Any plasticity model that
     we implemenet is going to need the elastic stiffness matrix.
+
+    A material model can be used for a single integration point, with its own state, or for
+    all integration points at once with the batched functions, where the state is kept in
+    a MaterialStateStore. In the latter case, the store starts from initial_state, a copy of the state
+    that the instance was made with. The state of the instance itself is overwritten when the points are
+    evaluated one by one, so it must not be used to start a store.
     """
 
+    # Whether the batched functions can be called for different points from several threads at once.
+    # The default batched functions cannot, since they evaluate the points through the state of the instance.
+    thread_safe = False
+
     def __init__(self, elasticity_module, poission_ratio, state):
         self.elasticity_module = elasticity_module
         self.poission_ratio = poission_ratio
 
+        self.initial_state = deepcopy(state)
         self.state = deepcopy(state)
         self.tmp_state = deepcopy(state)
 
+        # The elastic stiffness matrix only depends on the parameters of the material model.
+        # So, it is computed once here instead of at every evaluation of the stress.
+        self.elastic_stiffness = self._make_elastic_stiffness()
+
     @abstractmethod
     def compute_stress_and_stiffness(self, increment_strain):
         """This function should return a tuple, stress vector and the stiffness matrix"""
         pass
 
+    def compute_stress(self, increment_strain):
+        """This function returns the stress vector only. It is used when the stiffness matrix
+        is not needed, e.g. to compute the internal force vector. Material models should override
+        it if the stress can be computed without the stiffness matrix."""
+        _, stress = self.compute_stress_and_stiffness(increment_strain)
+        return stress
+
+    def compute_stress_and_stiffness_batched(self, increment_strain, state, tmp_state):
+        """Computes the stress and the stiffness matrix at many integration points at once.
+
+        Args:
+            increment_strain (np.array): strain increments with the format of Nx3.
+            state (dict): the committed state of the N points, e.g. from MaterialStateStore.get_state.
+                It must not be modified.
+            tmp_state (dict): the trial state of the N points, e.g. from MaterialStateStore.get_tmp_state.
+                It is overwritten with the new state.
+
+        Returns:
+            tuple: stiffness matrices with the format of Nx3x3 and stresses with the format of Nx3.
+
+        By default, the points are evaluated one by one with compute_stress_and_stiffness.
+        This keeps material models that only implement the single point methods working.
+        Material models should override it with a vectorized version when possible.
+        """
+        stiffness = np.zeros(increment_strain.shape + increment_strain.shape[-1:])
+        stress = np.zeros_like(increment_strain)
+
+        for n in range(len(increment_strain)):
+            self._bind_state(state, n)
+            stiffness[n], stress[n] = self.compute_stress_and_stiffness(
+                increment_strain[n]
+            )
+            self._unbind_tmp_state(tmp_state, n)
+
+        return stiffness, stress
+
+    def compute_stress_batched(self, increment_strain, state, tmp_state):
+        """Same as compute_stress_and_stiffness_batched, but returns the stresses only."""
+        stress = np.zeros_like(increment_strain)
+
+        for n in range(len(increment_strain)):
+            self._bind_state(state, n)
+            stress[n] = self.compute_stress(increment_strain[n])
+            self._unbind_tmp_state(tmp_state, n)
+
+        return stress
+
+    def _bind_state(self, state, n):
+        # The single point methods read self.state and write self.tmp_state.
+        # tmp_state starts from the committed state, so that entries the model does not write stay valid.
+        self.state = {name: value[n] for name, value in state.items()}
+        self.tmp_state = {name: value[n].copy() for name, value in state.items()}
+
+    def _unbind_tmp_state(self, tmp_state, n):
+        for name, value in self.tmp_state.items():
+            tmp_state[name][n] = value
+
     def save_state(self):
         # This is a way to deepcopy a dictionary in python
         # self.state = self.tmp_state copies refrence! This is not what we want
         self.state = deepcopy(self.tmp_state)
 
-    @property
-    def elastic_stiffness(self):
+    def _make_elastic_stiffness(self):
         e = self.elasticity_module
         nu = self.poission_ratio
 
@@ -63,25 +134,55 @@ class AbstractMaterialModel(ABC):
 
 
 class LinearElasticMaterialModel(AbstractMaterialModel):
+    thread_safe = True
+
     def __init__(self, elasticity_module, poission_ratio):
         state = {"stress": np.zeros((3,))}
 
         super().__init__(elasticity_module, poission_ratio, state=state)
 
     def compute_stress_and_stiffness(self, increment_strain):
-        stress = self.state["stress"]
+        # Note that the state must not be modified in place. It holds the values at the begining
+        # of the time step, and it is used at every Newton iteration.
         increment_stress = np.dot(self.elastic_stiffness, increment_strain)
 
-        stress += increment_stress
+        stress = self.state["stress"] + increment_stress
 
         self.tmp_state["stress"] = stress
 
         return self.elastic_stiffness, stress
 
+    def compute_stress(self, increment_strain):
+        stress = self.state["stress"] + np.dot(self.elastic_stiffness, increment_strain)
+
+        self.tmp_state["stress"] = stress
+
+        return stress
+
+    def compute_stress_and_stiffness_batched(self, increment_strain, state, tmp_state):
+        stress = self.compute_stress_batched(increment_strain, state, tmp_state)
+
+        # The stiffness matrix is the same at all points. broadcast_to does not copy it.
+        stiffness = np.broadcast_to(
+            self.elastic_stiffness, stress.shape + stress.shape[-1:]
+        )
+
+        return stiffness, stress
+
+    def compute_stress_batched(self, increment_strain, state, tmp_state):
+        # increment_strain holds one strain per row. So, D * strain becomes strain * D^T.
+        stress = state["stress"] + increment_strain @ self.elastic_stiffness.T
+
+        tmp_state["stress"][...] = stress
+
+        return stress
+
 
 class NonelinearElasticMaterialModel(AbstractMaterialModel):
     """This is a toy example to test the implementation of a nonlinear material model."""
 
+    thread_safe = True
+
     def __init__(self, elasticity_module, poission_ratio):
         state = {"stress": np.zeros((3,)), "strain": np.zeros((3,))}
 
@@ -91,10 +192,7 @@ class NonelinearElasticMaterialModel(AbstractMaterialModel):
         """This is a toy example to test the implementation of a nonlinear material model.
 
         Note that this nonlinearity is so mild, that a linear solver also suffices."""
-        stress = self.state["stress"]
-        strain = self.state["strain"]
-
-        strain += increment_strain
+        strain = self.state["strain"] + increment_strain
 
         stress = np.dot(self.elastic_stiffness, 1 - np.exp(-strain))
 
@@ -105,6 +203,40 @@ class NonelinearElasticMaterialModel(AbstractMaterialModel):
 
         return stiffness_matrix, stress
 
+    def compute_stress(self, increment_strain):
+        strain = self.state["strain"] + increment_strain
+
+        stress = np.dot(self.elastic_stiffness, 1 - np.exp(-strain))
+
+        self.tmp_state["stress"] = stress
+        self.tmp_state["strain"] = strain
+
+        return stress
+
+    def compute_stress_and_stiffness_batched(self, increment_strain, state, tmp_state):
+        strain = state["strain"] + increment_strain
+        exp_strain = np.exp(-strain)
+
+        stress = (1 - exp_strain) @ self.elastic_stiffness.T
+
+        # D * diag(exp(-strain)) scales the columns of D.
+        stiffness = self.elastic_stiffness * exp_strain[:, np.newaxis, :]
+
+        tmp_state["stress"][...] = stress
+        tmp_state["strain"][...] = strain
+
+        return stiffness, stress
+
+    def compute_stress_batched(self, increment_strain, state, tmp_state):
+        strain = state["strain"] + increment_strain
+
+        stress = (1 - np.exp(-strain)) @ self.elastic_stiffness.T
+
+        tmp_state["stress"][...] = stress
+        tmp_state["strain"][...] = strain
+
+        return stress
+
 
 def get_material_model(material_model_name, **kwargs):
     if material_model_name == "linear_elastic":
@@ -117,11 +249,3 @@ def get_material_model(material_model_name, **kwargs):
         raise NotImplementedError(
             f"Material model {material_model_name} is not implemented."
         )
-
-
-if __name__ == "__main__":
-    mat = get_material_model(
-        "nonlinear_elastic", elasticity_module=1, poission_ratio=0.3
-    )
-
-    mat = get_material_model("hyper_elastic", elasticity_module=1, poission_ratio=0.3)
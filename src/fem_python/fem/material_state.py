@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class MaterialStateStore:
+    """Holds the state of the material model at all integration points of all elements.
+
+    Each quantity of the state (e.g. stress, strain) is a single contiguous array with the format of
+    ExGx... instead of one small array per integration point. There are two buffers:
+        committed: the state at the begining of the time step. It must not be modified during the
+                   Newton iterations, since every iteration starts from it.
+        trial: the state at the current Newton iteration. The material model writes it at every
+               evaluation of the stress.
+
+    When a time step converges, the trial state becomes the committed state. Instead of copying,
+    the two buffers are swapped. The old committed buffer is reused as the trial buffer of the
+    next time step, which is fine since the material model overwrites it entirely at the next evaluation.
+
+    Material models see the state through get_state and get_tmp_state, where the elements and
+    integration points are flattened into N = E * G points.
+    """
+
+    def __init__(self, initial_state, num_elements, num_integration_points):
+        """initial_state is the state of a single integration point, e.g. the state
+        of a material model instance."""
+        self.num_elements = num_elements
+        self.num_integration_points = num_integration_points
+
+        shape = (num_elements, num_integration_points)
+
+        self.committed = {
+            name: np.broadcast_to(value, shape + np.shape(value)).copy()
+            for name, value in initial_state.items()
+        }
+        self.trial = {name: value.copy() for name, value in self.committed.items()}
+
+    @property
+    def num_points(self):
+        return self.num_elements * self.num_integration_points
+
+    def get_state(self):
+        """Views of the committed state with the format of Nx..."""
+        return self._flatten(self.committed)
+
+    def get_tmp_state(self):
+        """Views of the trial state with the format of Nx..."""
+        return self._flatten(self.trial)
+
+    def save_state(self):
+        self.committed, self.trial = self.trial, self.committed
+
+    def _flatten(self, state):
+        return {
+            name: value.reshape((self.num_points,) + value.shape[2:])
+            for name, value in state.items()
+        }
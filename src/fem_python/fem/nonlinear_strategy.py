@@ -0,0 +1,210 @@
+from abc import ABC, abstractmethod
+import time
+
+import numpy as np
+
+from fem_python.fem.solver import AbstractSolver
+from fem_python import config
+
+
+class AbstractNonlinearStrategy(ABC):
+    """This is an abstract class for strategies that find the displacement increment of a time step
+    iteratively. At each iteration, the strategy gets the stiffness matrix and the residual (both
+    with boundary conditions applied) and returns the iteration displacement.
+
+    Factorizing the stiffness matrix is the most expensive part of an iteration. Strategies differ
+    in how often they do it:
+        full_newton: factorizes at every iteration. Converges quadratically.
+        modified_newton: reuses the factorization for a few iterations, or until the convergence
+                         slows down. Converges linearly, but iterations are cheap.
+        initial_stiffness: factorizes once and reuses the factorization for the whole run.
+        bfgs: like modified_newton, but improves the reused factorization with BFGS updates
+              built from the previous iterations of the time step.
+
+    needs_stiffness tells whether the stiffness matrix is used at the next iteration. If not,
+    only the residual has to be computed.
+    """
+
+    def __init__(self, solver: AbstractSolver):
+        self.solver = solver
+        self.stats = {"factorized": False, "solve_time": 0.0}
+
+        self._is_factorized = False
+        self._previous_residual_norm = None
+
+    def begin_time_step(self):
+        self._previous_residual_norm = None
+
+    @abstractmethod
+    def needs_stiffness(self, iter_num):
+        pass
+
+    def compute_iteration(self, stiffness_mat, residual_vec, iter_num):
+        start = time.perf_counter()
+
+        factorized = self.needs_stiffness(iter_num)
+        if factorized:
+            self.solver.factorize(stiffness_mat)
+            self._is_factorized = True
+
+        iteration_displacement_vec = self._solve(residual_vec, factorized)
+
+        self._previous_residual_norm = np.linalg.norm(residual_vec)
+
+        self.stats = {
+            "factorized": factorized,
+            "solve_time": time.perf_counter() - start,
+        }
+        return iteration_displacement_vec
+
+    def _solve(self, residual_vec, factorized):
+        return self.solver.solve_factorized(residual_vec)
+
+
+class FullNewtonStrategy(AbstractNonlinearStrategy):
+    def needs_stiffness(self, iter_num):
+        return True
+
+
+class InitialStiffnessStrategy(AbstractNonlinearStrategy):
+    def needs_stiffness(self, iter_num):
+        return not self._is_factorized
+
+
+class ModifiedNewtonStrategy(AbstractNonlinearStrategy):
+    """The factorization is reused for at most max_stiffness_reuse iterations. It is also renewed
+    when the residual decreases by less than max_convergence_rate in an iteration, which means the
+    reused stiffness matrix no longer represents the material well.
+
+    Since needs_stiffness is asked before the residual of the next iteration is known, the rate
+    is measured between the last two residuals.
+    """
+
+    def __init__(self, solver, max_stiffness_reuse=None, max_convergence_rate=None):
+        super().__init__(solver)
+
+        self.max_stiffness_reuse = (
+            config.max_stiffness_reuse
+            if max_stiffness_reuse is None
+            else max_stiffness_reuse
+        )
+        self.max_convergence_rate = (
+            config.max_convergence_rate
+            if max_convergence_rate is None
+            else max_convergence_rate
+        )
+
+        self._num_reuses = 0
+        self._convergence_rate = 0.0
+
+    def begin_time_step(self):
+        super().begin_time_step()
+        self._convergence_rate = 0.0
+
+    def needs_stiffness(self, iter_num):
+        return (
+            not self._is_factorized
+            or self._num_reuses >= self.max_stiffness_reuse
+            or self._convergence_rate > self.max_convergence_rate
+        )
+
+    def compute_iteration(self, stiffness_mat, residual_vec, iter_num):
+        previous_residual_norm = self._previous_residual_norm
+
+        iteration_displacement_vec = super().compute_iteration(
+            stiffness_mat, residual_vec, iter_num
+        )
+
+        if self.stats["factorized"]:
+            # The current residual says nothing about the new factorization.
+            self._num_reuses = 0
+            self._convergence_rate = 0.0
+        else:
+            self._num_reuses += 1
+            if previous_residual_norm:
+                self._convergence_rate = (
+                    np.linalg.norm(residual_vec) / previous_residual_norm
+                )
+
+        return iteration_displacement_vec
+
+
+class BFGSStrategy(ModifiedNewtonStrategy):
+    """BFGS improves the inverse of the reused stiffness matrix with rank two updates, so that it
+    maps the change of the residual to the change of the displacement of the previous iterations.
+    The updates are applied with the two-loop recursion. The reused factorization is the initial inverse.
+
+    Let s be the iteration displacement and y the change of the gradient (the negative of the residual)
+    between two iterations. Each pair (s, y) is one update. Pairs are only valid within a time step,
+    and for the factorization they were made with. So, they are cleared when either changes.
+    """
+
+    def __init__(self, solver, max_stiffness_reuse=None, max_convergence_rate=None):
+        super().__init__(solver, max_stiffness_reuse, max_convergence_rate)
+        self._clear_updates()
+
+    def begin_time_step(self):
+        super().begin_time_step()
+        self._clear_updates()
+
+    def compute_iteration(self, stiffness_mat, residual_vec, iter_num):
+        if self._previous_residual_vec is not None:
+            s = self._previous_iteration_displacement_vec
+            y = self._previous_residual_vec - residual_vec
+            curvature = y.dot(s)
+
+            # Updates that do not satisfy the curvature condition would make the inverse indefinite.
+            if curvature > 0:
+                self._updates.append((s, y, 1 / curvature))
+
+        iteration_displacement_vec = super().compute_iteration(
+            stiffness_mat, residual_vec, iter_num
+        )
+
+        self._previous_residual_vec = residual_vec.copy()
+        self._previous_iteration_displacement_vec = iteration_displacement_vec.copy()
+
+        return iteration_displacement_vec
+
+    def _solve(self, residual_vec, factorized):
+        if factorized:
+            self._clear_updates()
+
+        q = residual_vec.copy()
+        alphas = []
+        for s, y, rho in reversed(self._updates):
+            alpha = rho * s.dot(q)
+            q -= alpha * y
+            alphas.append(alpha)
+
+        z = self.solver.solve_factorized(q)
+
+        for (s, y, rho), alpha in zip(self._updates, reversed(alphas)):
+            beta = rho * y.dot(z)
+            z += s * (alpha - beta)
+
+        return z
+
+    def _clear_updates(self):
+        self._updates = []
+        self._previous_residual_vec = None
+        self._previous_iteration_displacement_vec = None
+
+
+def get_nonlinear_strategy(strategy_name, solver) -> AbstractNonlinearStrategy:
+    if strategy_name == "full_newton":
+        return FullNewtonStrategy(solver)
+
+    elif strategy_name == "modified_newton":
+        return ModifiedNewtonStrategy(solver)
+
+    elif strategy_name == "initial_stiffness":
+        return InitialStiffnessStrategy(solver)
+
+    elif strategy_name == "bfgs":
+        return BFGSStrategy(solver)
+
+    else:
+        raise NotImplementedError(
+            f"Nonlinear strategy {strategy_name} is not implemented."
+        )
@@ -154,7 +154,8 @@ class Q4ShapeFunction(ShapeFunction):
         jacobian = dn_mat.dot(self.nodes)
         return jacobian
 
-    def _get_shape_functions_and_their_derivatives(self, point: Point):
+    @staticmethod
+    def _get_shape_functions_and_their_derivatives(point: Point):
         # Note that the shape function matrix has two rows and four columns.
         # Each column is associated with a node. Each row is associated with x or y direction.
         # For instance, the value at (1,0) is the shape function of the second node associated with
@@ -186,6 +187,63 @@ class Q4ShapeFunction(ShapeFunction):
         return n_mat, dn_dxi_mat
 
 
+def evaluate_b_and_jacob_determinant_batched(element_node_coords, points, element_type):
+    """This is the batched version of evaluate_b_at and evaluate_jacob_determinant_at.
+    Instead of one element and one integration point, it evaluates all elements at all
+    integration points at once.
+
+    Args:
+        element_node_coords (np.array): node coordinates of all elements with the format of Ex4x2.
+        points (List[Point]): the G points at which B and the jacobian determinant are evaluated.
+
+    Returns:
+        b_mat (np.array): B matrices with the format of ExGx3x8.
+        jacob_det (np.array): jacobian determinants with the format of ExG.
+    """
+    if element_type != "Q4":
+        raise NotImplementedError(
+            f"Batched B matrix for element type {element_type} is not implemented"
+        )
+
+    # The derivatives of shape functions in the isoparametric space are the same for all elements.
+    # They only depend on the point. So, they are computed once with the format of Gx2x4.
+    dn_dxi_mat = np.array(
+        [
+            Q4ShapeFunction._get_shape_functions_and_their_derivatives(p)[1]
+            for p in points
+        ]
+    )
+
+    # jacobian[e, g] = dn_dxi_mat[g].dot(element_node_coords[e]), with the format of ExGx2x2
+    jacobian = np.einsum("gik,ekj->egij", dn_dxi_mat, element_node_coords)
+
+    jacob_det = (
+        jacobian[..., 0, 0] * jacobian[..., 1, 1]
+        - jacobian[..., 0, 1] * jacobian[..., 1, 0]
+    )
+
+    # The inverse of a 2x2 matrix [[a, b], [c, d]] is [[d, -b], [-c, a]] / det.
+    inv_jacob = np.empty_like(jacobian)
+    inv_jacob[..., 0, 0] = jacobian[..., 1, 1]
+    inv_jacob[..., 0, 1] = -jacobian[..., 0, 1]
+    inv_jacob[..., 1, 0] = -jacobian[..., 1, 0]
+    inv_jacob[..., 1, 1] = jacobian[..., 0, 0]
+    inv_jacob /= jacob_det[..., None, None]
+
+    # The first row is dn_dx and the second row is dn_dy, with the format of ExGx2x4
+    dn_dx_mat = np.einsum("egij,gjk->egik", inv_jacob, dn_dxi_mat)
+
+    # See evaluate_b_at of Q4ShapeFunction for the layout of the B matrix.
+    num_elements, num_points = jacob_det.shape
+    b_mat = np.zeros((num_elements, num_points, 3, 8))
+    b_mat[..., 0, 0::2] = dn_dx_mat[..., 0, :]
+    b_mat[..., 1, 1::2] = dn_dx_mat[..., 1, :]
+    b_mat[..., 2, 0::2] = dn_dx_mat[..., 1, :]
+    b_mat[..., 2, 1::2] = dn_dx_mat[..., 0, :]
+
+    return b_mat, jacob_det
+
+
 def get_shape_function(nodes, element_type):
     if element_type == "Q4":
         return Q4ShapeFunction(nodes)
@@ -1,6 +1,314 @@
+from abc import ABC, abstractmethod
+import time
+
 import numpy as np
+import scipy.linalg
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator, cg, minres, spilu, spsolve, splu
+
+from fem_python import config
+from fem_python.fem.assembly_plan import SparsityPattern, make_submatrix_map
 
 
 def solve(stiffness_mat, force_vec):
-    displacement_vec = np.linalg.solve(stiffness_mat, force_vec)
+    if sparse.issparse(stiffness_mat):
+        displacement_vec = spsolve(stiffness_mat.tocsc(), force_vec)
+    else:
+        displacement_vec = np.linalg.solve(stiffness_mat, force_vec)
     return displacement_vec
+
+
+class AbstractSolver(ABC):
+    """This is an abstract class for linear solvers. Solving K u = f is split into two steps:
+    factorize, which only depends on the stiffness matrix, and solve_factorized, which uses the
+    factorization to find u for a given f. This way the factorization can be reused for
+    several force vectors.
+
+    A solver instance is meant to live during the whole run. Since the sparsity pattern of
+    the stiffness matrix does not change, solvers can keep whatever only depends on the pattern
+    (e.g. a fill-reducing ordering) between calls.
+
+    After each solve, stats holds the time spent in the solve and, for iterative solvers,
+    the number of iterations.
+    """
+
+    def __init__(self):
+        self.stats = {"solve_time": 0.0, "iterations": None}
+
+    @abstractmethod
+    def factorize(self, stiffness_mat):
+        pass
+
+    @abstractmethod
+    def solve_factorized(self, force_vec):
+        pass
+
+    def solve(self, stiffness_mat, force_vec):
+        start = time.perf_counter()
+
+        self.factorize(stiffness_mat)
+        displacement_vec = self.solve_factorized(force_vec)
+
+        self.stats["solve_time"] = time.perf_counter() - start
+        return displacement_vec
+
+
+class DenseSolver(AbstractSolver):
+    """LU factorization of a dense stiffness matrix. Only meant for tiny meshes."""
+
+    def factorize(self, stiffness_mat):
+        if sparse.issparse(stiffness_mat):
+            stiffness_mat = stiffness_mat.toarray()
+
+        self._lu = scipy.linalg.lu_factor(stiffness_mat)
+
+    def solve_factorized(self, force_vec):
+        return scipy.linalg.lu_solve(self._lu, force_vec)
+
+
+class SparseSolver(AbstractSolver):
+    """Base class for sparse solvers that keep information about the sparsity pattern."""
+
+    def __init__(self):
+        super().__init__()
+        self._pattern = SparsityPattern()
+
+
+class SuperLUSolver(SparseSolver):
+    """Sparse LU factorization with SuperLU.
+
+    The amount of fill-in (and so the cost of the factorization) depends on the order of the
+    unknowns. SuperLU computes a fill-reducing ordering before the numeric factorization.
+    This ordering only depends on the sparsity pattern. So, we let SuperLU compute it at the first
+    factorization and keep it. For the next factorizations, the stiffness matrix is permuted
+    with the kept ordering and SuperLU is told not to reorder.
+
+    Permuting the stiffness matrix is also worked out once: we keep, for each entry of
+    the permuted matrix, the index of the entry of the original matrix it comes from.
+    """
+
+    def factorize(self, stiffness_mat):
+        stiffness_mat = sparse.csr_matrix(stiffness_mat)
+
+        if self._pattern.changed(stiffness_mat):
+            self._analyze(stiffness_mat)
+
+        permuted_mat = sparse.csc_matrix(
+            (
+                stiffness_mat.data[self._data_map],
+                self._permuted_indices,
+                self._permuted_indptr,
+            ),
+            shape=stiffness_mat.shape,
+        )
+        self._lu = splu(permuted_mat, permc_spec="NATURAL")
+
+    def solve_factorized(self, force_vec):
+        displacement_vec = np.empty_like(force_vec)
+        displacement_vec[self._order] = self._lu.solve(force_vec[self._order])
+        return displacement_vec
+
+    def _analyze(self, stiffness_mat):
+        # The stiffness matrix has a symmetric sparsity pattern. So, the ordering is computed
+        # on the pattern of K^T + K and applied to both rows and columns.
+        # SuperLU does not expose the ordering on its own, so it is read from a factorization.
+        lu = splu(stiffness_mat.tocsc(), permc_spec="MMD_AT_PLUS_A")
+        self._order = np.argsort(lu.perm_c)
+
+        self._data_map, self._permuted_indices, self._permuted_indptr = (
+            make_submatrix_map(stiffness_mat, self._order, self._order, format="csc")
+        )
+
+
+class CholmodSolver(SparseSolver):
+    """Sparse Cholesky factorization with CHOLMOD (scikit-sparse). It requires the stiffness
+    matrix to be symmetric positive definite, e.g. linear elasticity.
+
+    CHOLMOD explicitly splits the factorization into a symbolic analysis (ordering and
+    structure of the factor), which only depends on the sparsity pattern, and a numeric
+    factorization. The symbolic analysis is done once and reused.
+    """
+
+    def __init__(self):
+        try:
+            from sksparse.cholmod import analyze
+        except ImportError as e:
+            raise ImportError(
+                "The cholmod solver requires scikit-sparse. Install it or use the superlu solver."
+            ) from e
+
+        super().__init__()
+        self._analyze = analyze
+
+    def factorize(self, stiffness_mat):
+        stiffness_mat = sparse.csc_matrix(stiffness_mat)
+
+        if self._pattern.changed(stiffness_mat):
+            self._factor = self._analyze(stiffness_mat)
+
+        self._factor.cholesky_inplace(stiffness_mat)
+
+    def solve_factorized(self, force_vec):
+        return self._factor(force_vec)
+
+
+class IterativeSolver(AbstractSolver):
+    """Preconditioned Krylov solver (conjugate gradient or MINRES) for large meshes, where even
+    a sparse factorization does not fit in memory. Both methods require a symmetric stiffness matrix.
+
+    "factorize" only builds the preconditioner:
+        jacobi: the inverse of the diagonal of the stiffness matrix.
+        ilu: an incomplete LU factorization. The stiffness matrix is symmetric, so this is close
+             to an incomplete Cholesky factorization.
+        amg: a smoothed aggregation algebraic multigrid V-cycle (requires pyamg).
+
+    The linear system only needs to be solved as accurately as the Newton method needs (inexact Newton).
+    Far from equilibrium, a rough solution is enough. Close to equilibrium, the solution should be accurate
+    to keep the quadratic convergence. The force vector is the Newton residual. So, following Eisenstat and
+    Walker, the relative tolerance is
+        min(max_rtol, 0.9 * (|r_k| / |r_k-1|)^2)
+    where r_k and r_k-1 are the force vectors of the current and the previous solve.
+
+    The solution of the previous solve is used as the initial guess (warm start).
+    """
+
+    max_restarts = 10
+
+    def __init__(
+        self,
+        method,
+        preconditioner_name=None,
+        max_rtol=None,
+        min_rtol=None,
+        warm_start=None,
+    ):
+        if method not in ("cg", "minres"):
+            raise NotImplementedError(f"Iterative method {method} is not implemented.")
+
+        super().__init__()
+        self.method = method
+        self.preconditioner_name = (
+            config.preconditioner_name
+            if preconditioner_name is None
+            else preconditioner_name
+        )
+        self.max_rtol = config.max_linear_rtol if max_rtol is None else max_rtol
+        self.min_rtol = config.min_linear_rtol if min_rtol is None else min_rtol
+        self.warm_start = config.warm_start if warm_start is None else warm_start
+
+        self._previous_residual_norm = None
+        self._previous_solution = None
+
+    def factorize(self, stiffness_mat):
+        self._stiffness_mat = sparse.csr_matrix(stiffness_mat)
+        self._preconditioner = self._make_preconditioner(self._stiffness_mat)
+
+    def solve_factorized(self, force_vec):
+        residual_norm = np.linalg.norm(force_vec)
+
+        if self._previous_residual_norm:
+            rtol = 0.9 * (residual_norm / self._previous_residual_norm) ** 2
+        else:
+            rtol = self.max_rtol
+        rtol = min(max(rtol, self.min_rtol), self.max_rtol)
+
+        self._previous_residual_norm = residual_norm
+
+        x0 = None
+        if self.warm_start and self._previous_solution is not None:
+            # Newton corrections become smaller at each iteration. So, the previous solution is
+            # scaled by the factor that minimizes the energy norm of the error along it.
+            # This way the initial guess is never worse than zero.
+            x0 = self._previous_solution
+            x0_stiffness_x0 = x0.dot(self._stiffness_mat @ x0)
+            scale = x0.dot(force_vec) / x0_stiffness_x0 if x0_stiffness_x0 > 0 else 0
+            x0 = scale * x0 if scale > 0 else None
+
+        num_iterations = 0
+
+        def count_iterations(_):
+            nonlocal num_iterations
+            num_iterations += 1
+
+        krylov_method = cg if self.method == "cg" else minres
+
+        # Inexact Newton needs |f - K u| <= rtol |f|. MINRES stops based on an estimate of
+        # the backward error instead, which can be much looser. So, the true residual is checked
+        # and the method is restarted from where it stopped, with a tighter tolerance,
+        # until the condition holds.
+        krylov_rtol = rtol
+        for _ in range(self.max_restarts + 1):
+            displacement_vec, info = krylov_method(
+                self._stiffness_mat,
+                force_vec,
+                x0=x0,
+                rtol=krylov_rtol,
+                M=self._preconditioner,
+                callback=count_iterations,
+            )
+
+            if info < 0:
+                raise Exception(f"{self.method} failed with info={info}")
+
+            linear_residual_norm = np.linalg.norm(
+                force_vec - self._stiffness_mat @ displacement_vec
+            )
+            if linear_residual_norm <= rtol * residual_norm:
+                break
+
+            x0 = displacement_vec
+            krylov_rtol /= 10
+        else:
+            print(
+                f"{self.method} did not reach the tolerance {rtol} in {num_iterations} iterations"
+            )
+
+        self._previous_solution = displacement_vec
+        self.stats["iterations"] = num_iterations
+
+        return displacement_vec
+
+    def _make_preconditioner(self, stiffness_mat):
+        if self.preconditioner_name == "jacobi":
+            inv_diagonal = 1 / stiffness_mat.diagonal()
+            return LinearOperator(
+                stiffness_mat.shape, matvec=lambda x: inv_diagonal * x
+            )
+
+        elif self.preconditioner_name == "ilu":
+            ilu = spilu(stiffness_mat.tocsc(), drop_tol=1e-4, fill_factor=10)
+            return LinearOperator(stiffness_mat.shape, matvec=ilu.solve)
+
+        elif self.preconditioner_name == "amg":
+            try:
+                import pyamg
+            except ImportError as e:
+                raise ImportError(
+                    "The amg preconditioner requires pyamg. Install it or use jacobi or ilu."
+                ) from e
+
+            return pyamg.smoothed_aggregation_solver(stiffness_mat).aspreconditioner(
+                cycle="V"
+            )
+
+        else:
+            raise NotImplementedError(
+                f"Preconditioner {self.preconditioner_name} is not implemented."
+            )
+
+
+def get_solver(solver_name) -> AbstractSolver:
+    if solver_name == "dense":
+        return DenseSolver()
+
+    elif solver_name == "superlu":
+        return SuperLUSolver()
+
+    elif solver_name == "cholmod":
+        return CholmodSolver()
+
+    elif solver_name in ("cg", "minres"):
+        return IterativeSolver(solver_name)
+
+    else:
+        raise NotImplementedError(f"Solver {solver_name} is not implemented.")
@@ -1,79 +1,262 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
-from fem_python.fem.shape_functions import get_shape_function
+from fem_python.fem.assembly_plan import get_assembly_plan
+from fem_python.fem.geometry import get_element_geometry
 from fem_python.mesh.mesh import FEMMesh
-from fem_python.fem.integration import get_gauss_integration_setting
 from fem_python.fem.material_model import AbstractMaterialModel
+from fem_python.fem.material_state import MaterialStateStore
 from fem_python import config
 
+# Thread pools are kept between assemblies, one per number of threads.
+_thread_pools = {}
+
 
 def make_stiffness_matrix_and_internal_force_vector(
     fem_mesh: FEMMesh,
     increment_displacement_vec,
-    materials: List[List[AbstractMaterialModel]],
+    material: AbstractMaterialModel,
+    material_state: MaterialStateStore,
+    assembly_mode=None,
+    num_threads=None,
 ):
-    # Integration points are used to integrate stiffness matrices.
-    # Stiffness matrix consists of polynomial shap functions. Ideally,
-    # we would like to have a number of integration points that solve for the
-    # integral exactly.
-    integration_points = get_gauss_integration_setting(
-        num_int_points=config.num_integration_points
+    """Assembles the global stiffness matrix and the internal force vector.
+
+    The element stiffness matrices and element internal force vectors are computed first.
+    They are then added to the global ones in a single scatter, using the assembly plan of the mesh.
+
+    In the "sparse" assembly mode (default), the stiffness matrix is a CSR matrix whose sparsity
+    pattern is given by the assembly plan. Only its values are computed here.
+    The memory of the stiffness matrix then grows linearly with the number of nodes.
+
+    In the "dense" assembly mode, the stiffness matrix is a full numpy array. Its memory grows
+    quadratically with the number of nodes. Use it only to debug tiny meshes.
+
+    With num_threads > 1 (see config.num_assembly_threads), the elements are split into chunks
+    that are evaluated on a thread pool (see assemble_in_chunks).
+    """
+    if assembly_mode is None:
+        assembly_mode = config.assembly_mode
+
+    if assembly_mode not in ("sparse", "dense"):
+        raise NotImplementedError(f"Assembly mode {assembly_mode} is not implemented.")
+
+    return assemble_in_chunks(
+        fem_mesh,
+        increment_displacement_vec,
+        material,
+        material_state,
+        assembly_mode,
+        num_threads,
     )
 
+
+def make_internal_force_vector(
+    fem_mesh: FEMMesh,
+    increment_displacement_vec,
+    material: AbstractMaterialModel,
+    material_state: MaterialStateStore,
+    num_threads=None,
+):
+    """Assembles the internal force vector only. Compared to
+    make_stiffness_matrix_and_internal_force_vector, the material model does not compute
+    the stiffness matrices and nothing is scattered into the global stiffness matrix.
+
+    This is what is needed to evaluate the residual, e.g. when the factorization of an earlier
+    stiffness matrix is reused, or to collect reaction forces.
+    """
+    _, internal_force_vec = assemble_in_chunks(
+        fem_mesh,
+        increment_displacement_vec,
+        material,
+        material_state,
+        None,
+        num_threads,
+    )
+    return internal_force_vec
+
+
+def assemble_in_chunks(
+    fem_mesh: FEMMesh,
+    increment_displacement_vec,
+    material: AbstractMaterialModel,
+    material_state: MaterialStateStore,
+    assembly_mode,
+    num_threads=None,
+):
+    """The elements are split into num_threads chunks of consecutive elements. Each chunk is
+    evaluated on its own thread: strains, material model, element matrices and vectors, and the
+    scatter into a private copy of the global data. The private copies are summed at the end.
+    Since each thread only writes its own elements, integration points and copies, there are
+    no write conflicts.
+
+    Threads only run in parallel while numpy releases the GIL, i.e. inside the einsum and
+    elementwise kernels. Material models whose batched functions are not thread safe
+    are evaluated with a single chunk.
+
+    assembly_mode None means that only the internal force vector is assembled.
+    """
+    if num_threads is None:
+        num_threads = config.num_assembly_threads
+
+    if not material.thread_safe:
+        num_threads = 1
+
     # The problem we are considering has two degrees of freedom (ux, uy).
     # It essentially means that we allow each node to move in the x and y direction.
-    # Note than an FEM model can have many more degrees of freedom, based on the physics of the problem
-    num_dofs = fem_mesh.num_nodes * 2
-    stiffness_mat = np.zeros((num_dofs, num_dofs))
-    internal_force_vec = np.zeros((num_dofs,))
-
-    for e in range(fem_mesh.num_elements):
-        for i, integration_point in enumerate(integration_points):
-            # The FEM mesh is defined by a tables of node coordinates and a connectivity matrix.
-            # Here we use the connectivity matrix to the get nodes associated with an element.
-            # We then extract coordinates of each node from the node coordinates table
-            nodes = fem_mesh.connectivity_matrix[e]
-            node_coords = []
-            for node in nodes:
-                node_coord = fem_mesh.node_coords[node]
-                node_coords.append(node_coord)
-            node_coords = np.array(node_coords)
-
-            shape_function = get_shape_function(node_coords, config.element_type)
-            b = shape_function.evaluate_b_at(integration_point.point)
-            jacob_det = shape_function.evaluate_jacob_determinant_at(
-                integration_point.point
-            )
+    # Note than an FEM model can have many more degrees of freedom, based on the physics of the problem.
+    # The assembly plan knows which dofs belong to which element.
+    assembly_plan = get_assembly_plan(fem_mesh)
 
-            material = materials[e][i]
+    # B matrices, jacobian determinants and integration weights of all elements and
+    # integration points. These are computed once per mesh and reused.
+    geometry = get_element_geometry(fem_mesh)
 
-            dofs = []
-            for node in nodes:
-                dofs += [2 * node, 2 * node + 1]
+    element_increment_displacement = increment_displacement_vec[
+        assembly_plan.element_dofs
+    ]
 
-            element_increment_displacement = increment_displacement_vec[np.ix_(dofs)]
-            element_increment_strain = np.dot(b, element_increment_displacement)
+    # The material model evaluates all integration points of a chunk in one call.
+    # Its state is read from and written to the material state store.
+    state = material_state.get_state()
+    tmp_state = material_state.get_tmp_state()
+    num_integration_points = geometry.num_integration_points
 
-            element_stiffness, element_stress = material.compute_stress_and_stiffness(
-                element_increment_strain
-            )
+    def assemble_chunk(elements):
+        points = slice(
+            elements.start * num_integration_points,
+            elements.stop * num_integration_points,
+        )
+        chunk_state = {name: value[points] for name, value in state.items()}
+        chunk_tmp_state = {name: value[points] for name, value in tmp_state.items()}
 
-            element_stiffness_mat = (
-                np.dot(np.dot(b.T, element_stiffness), b)
-                * jacob_det
-                * integration_point.weight
-            )
+        b = geometry.b[elements]
+        integration_volume = geometry.integration_volume[elements]
 
-            element_internal_force = (
-                np.dot(b.T, element_stress) * jacob_det * integration_point.weight
+        strain = geometry.compute_strain(
+            element_increment_displacement[elements], elements
+        )
+        point_strain = strain.reshape(-1, strain.shape[-1])
+
+        if assembly_mode is None:
+            stress = material.compute_stress_batched(
+                point_strain, chunk_state, chunk_tmp_state
+            )
+            stiffness = None
+        else:
+            material_stiffness, stress = material.compute_stress_and_stiffness_batched(
+                point_strain, chunk_state, chunk_tmp_state
             )
+            element_stiffness_mats = compute_element_stiffness_matrices(
+                b,
+                material_stiffness.reshape(strain.shape + strain.shape[-1:]),
+                integration_volume,
+            )
+
+            if assembly_mode == "dense":
+                stiffness = element_stiffness_mats
+            else:
+                stiffness = assembly_plan.assemble_matrix_data(
+                    element_stiffness_mats, elements
+                )
+
+        element_internal_forces = compute_element_internal_forces(
+            b, stress.reshape(strain.shape), integration_volume
+        )
+        internal_force_vec = assembly_plan.assemble_vector(
+            element_internal_forces, elements
+        )
+
+        return stiffness, internal_force_vec
+
+    bounds = np.linspace(0, fem_mesh.num_elements, num_threads + 1).astype(int)
+    chunks = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    if num_threads == 1:
+        results = [assemble_chunk(chunks[0])]
+    else:
+        if num_threads not in _thread_pools:
+            _thread_pools[num_threads] = ThreadPoolExecutor(max_workers=num_threads)
+        results = list(_thread_pools[num_threads].map(assemble_chunk, chunks))
+
+    internal_force_vec = sum(result[1] for result in results)
+
+    if assembly_mode is None:
+        stiffness_mat = None
+    elif assembly_mode == "dense":
+        stiffness_mat = assembly_plan.assemble_dense_matrix(
+            np.concatenate([result[0] for result in results])
+        )
+    else:
+        stiffness_mat = assembly_plan.make_matrix(sum(result[0] for result in results))
 
-            stiffness_mat[np.ix_(dofs, dofs)] += element_stiffness_mat
-            internal_force_vec[np.ix_(dofs)] += element_internal_force
     return stiffness_mat, internal_force_vec
 
 
+def compute_element_stiffness_matrices(b, material_stiffness, integration_volume):
+    """Computes B^T D B detJ w for all elements and integration points, and sums over
+    the integration points.
+
+    Args:
+        b (np.array): B matrices with the format of ExGx3x8.
+        material_stiffness (np.array): material stiffness matrices with the format of ExGx3x3.
+        integration_volume (np.array): detJ w with the format of ExG.
+
+    Returns:
+        np.array: element stiffness matrices with the format of Ex8x8.
+    """
+    db = np.einsum("egij,egjk->egik", material_stiffness, b)
+    return np.einsum("egji,egjk,eg->eik", b, db, integration_volume)
+
+
+def compute_element_internal_forces(b, stress, integration_volume):
+    """Computes B^T stress detJ w for all elements and integration points, and sums over
+    the integration points. The result has the format of Ex8."""
+    return np.einsum("egji,egj,eg->ei", b, stress, integration_volume)
+
+
 if __name__ == "__main__":
-    pass
+    import time
+
+    from fem_python.fem.material_model import get_material_model
+
+    # Measures how the assembly time scales with the number of threads on the mesh of the config.
+    fem_mesh = FEMMesh()
+    material = get_material_model(
+        config.material_model_name,
+        elasticity_module=config.bar_elasticity_module,
+        poission_ratio=config.bar_poission_ratio,
+    )
+    material_state = MaterialStateStore(
+        material.initial_state,
+        fem_mesh.num_elements,
+        get_element_geometry(fem_mesh).num_integration_points,
+    )
+    increment_displacement_vec = np.random.default_rng(0).uniform(
+        -1e-3, 1e-3, (fem_mesh.num_nodes * 2,)
+    )
+
+    reference = None
+    for num_threads in [1, 2, 4, 8]:
+        times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            stiffness_mat, internal_force_vec = (
+                make_stiffness_matrix_and_internal_force_vector(
+                    fem_mesh,
+                    increment_displacement_vec,
+                    material,
+                    material_state,
+                    num_threads=num_threads,
+                )
+            )
+            times.append(time.perf_counter() - start)
+
+        if reference is None:
+            reference = (min(times), stiffness_mat, internal_force_vec)
+
+        print(
+            f"{num_threads} threads: {min(times):.4f}s, speedup {reference[0] / min(times):.2f}, "
+            f"max difference {abs(stiffness_mat - reference[1]).max():.1e}"
+        )
@@ -1 +1,2 @@
 from .mesh import FEMMesh
+from .structured_mesh import make_structured_mesh
@@ -1,6 +1,6 @@
-import meshio
 import numpy as np
 
+from fem_python.mesh.mesh_cache import read_mesh_arrays
 from fem_python import config
 
 
@@ -8,46 +8,169 @@ class FEMMesh:
     def __init__(self):
         mesh = self._load_msh_file()
 
-        self.node_coords = mesh.points[:, :2]
+        self._set_arrays(
+            mesh["node_coords"],
+            mesh["quad"],
+            self._get_boundary_connectivity_matrices(mesh),
+        )
+
+        self.cells = [("line", mesh["line"]), ("quad", mesh["quad"])]
+
+        if config.renumber_nodes:
+            self.renumber()
 
-        self.connectivity_matrix = mesh.cells_dict["quad"]
+    @classmethod
+    def from_arrays(
+        cls, node_coords, connectivity_matrix, boundary_connectivity_matrices
+    ):
+        """Makes a mesh from its arrays instead of a msh file. The arrays are not copied.
+        So, they can e.g. live in shared memory."""
+        fem_mesh = cls.__new__(cls)
 
-        self.boundary_connectivity_matrices = self._get_boundary_connectivity_matrices(
-            mesh
+        fem_mesh._set_arrays(
+            node_coords, connectivity_matrix, boundary_connectivity_matrices
         )
 
+        fem_mesh.cells = [("quad", connectivity_matrix)]
+
+        return fem_mesh
+
+    def _set_arrays(
+        self, node_coords, connectivity_matrix, boundary_connectivity_matrices
+    ):
+        self.node_coords = node_coords
+
+        self.connectivity_matrix = connectivity_matrix
+
+        self.boundary_connectivity_matrices = {
+            name: np.asarray(lines, dtype=int).reshape(-1, 2)
+            for name, lines in boundary_connectivity_matrices.items()
+        }
+
+        # Neighboring boundary lines share a node. The nodes of each boundary group are only
+        # counted once here. boundary_dofs holds their dofs, with the columns ux and uy.
+        self.boundary_nodes = {
+            name: np.unique(lines)
+            for name, lines in self.boundary_connectivity_matrices.items()
+        }
+        self.boundary_dofs = {
+            name: np.stack([2 * nodes, 2 * nodes + 1], axis=-1)
+            for name, nodes in self.boundary_nodes.items()
+        }
+
         self.num_nodes = len(self.node_coords)
         self.num_elements = len(self.connectivity_matrix)
 
-        self.cells = mesh.cells
+        # If the mesh is renumbered, node_order[i] is the original id of node i, and
+        # element_order[e] is the original id of element e. Otherwise, they are None.
+        self.node_order = None
+        self.element_order = None
+
+        # Quantities that are derived from the mesh, e.g. the assembly plan, are expensive to
+        # compute but do not change during the run. We compute them once and keep them here.
+        self.cache = {}
+
+        # Same as above, but for quantities that also depend on node coordinates,
+        # e.g. B matrices and jacobian determinants.
+        self.geometry_cache = {}
+
+    def renumber(self):
+        """Renumbers the nodes with the reverse Cuthill-McKee ordering, and sorts the elements
+        by their nodes.
+
+        Two nodes are coupled in the stiffness matrix if they share an element. RCM numbers the nodes
+        such that coupled nodes get close numbers. This reduces the bandwidth of the stiffness matrix,
+        which reduces the fill-in of direct solvers. Sorting the elements then makes consecutive
+        elements use nearby nodes, which helps the cache during assembly.
+
+        The cells (used to write the results) keep the original numbering. Use to_original_numbering
+        to map values at nodes back to it.
+        """
+        # Only needed when renumbering, which is optional.
+        from scipy import sparse
+        from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+        num_nodes_per_element = self.connectivity_matrix.shape[1]
+        rows = np.repeat(self.connectivity_matrix, num_nodes_per_element, axis=1)
+        cols = np.tile(self.connectivity_matrix, (1, num_nodes_per_element))
+        adjacency = sparse.csr_matrix(
+            (np.ones(rows.size), (rows.ravel(), cols.ravel())),
+            shape=(self.num_nodes, self.num_nodes),
+        )
 
-    def _load_msh_file(self):
-        return meshio.read(config.mesh_file_path)
+        node_order = reverse_cuthill_mckee(adjacency, symmetric_mode=True)
+        new_node_ids = np.argsort(node_order)
 
-    def _get_boundary_connectivity_matrices(self, mesh):
-        lines_physical_tags = mesh.cell_data_dict["gmsh:physical"]["line"]
+        connectivity_matrix = new_node_ids[self.connectivity_matrix]
+        element_order = np.argsort(connectivity_matrix.min(axis=1), kind="stable")
 
-        line_connectivity = mesh.cells_dict["line"]
-        boundary_connectivity_matrices = {"left": [], "right": [], "bottom": []}
+        previous_node_order = self.node_order
+        previous_element_order = self.element_order
 
-        for n in range(len(line_connectivity)):
-            if lines_physical_tags[n] == 12:
-                boundary_connectivity_matrices["left"].append(line_connectivity[n])
-            elif lines_physical_tags[n] == 11:
-                boundary_connectivity_matrices["right"].append(line_connectivity[n])
-            elif lines_physical_tags[n] == 13:
-                boundary_connectivity_matrices["bottom"].append(line_connectivity[n])
+        self._set_arrays(
+            self.node_coords[node_order],
+            connectivity_matrix[element_order],
+            {
+                name: new_node_ids[lines]
+                for name, lines in self.boundary_connectivity_matrices.items()
+            },
+        )
 
-        boundary_connectivity_matrices["left"] = np.array(
-            boundary_connectivity_matrices["left"]
+        # Renumbering twice composes the orders.
+        self.node_order = (
+            node_order
+            if previous_node_order is None
+            else previous_node_order[node_order]
         )
-        boundary_connectivity_matrices["right"] = np.array(
-            boundary_connectivity_matrices["right"]
+        self.element_order = (
+            element_order
+            if previous_element_order is None
+            else previous_element_order[element_order]
         )
 
-        return boundary_connectivity_matrices
+    def to_original_numbering(self, node_values):
+        """Maps values at nodes (the first axis) back to the numbering before renumber."""
+        if self.node_order is None:
+            return node_values
+
+        original_node_values = np.empty_like(node_values)
+        original_node_values[self.node_order] = node_values
+        return original_node_values
+
+    def get_bandwidth(self):
+        """The largest distance between two dofs that share an element. The stiffness matrix
+        has no entries further than this from the diagonal."""
+        node_ids = self.connectivity_matrix
+        return int(2 * (node_ids.max(axis=1) - node_ids.min(axis=1)).max() + 1)
+
+    def update_node_coords(self, node_coords):
+        """The connectivity stays the same. So, only the geometry cache becomes invalid."""
+        self.node_coords = node_coords
+        self.invalidate_geometry()
+
+    def invalidate_geometry(self):
+        self.geometry_cache.clear()
+
+    def _load_msh_file(self):
+        # The arrays come from a binary cache of the msh file, if it is up to date.
+        return read_mesh_arrays(config.mesh_file_path, use_cache=config.mesh_cache)
+
+    def _get_boundary_connectivity_matrices(self, mesh):
+        """Each boundary group is made of the lines with its physical tag (see config.boundary_tags)."""
+        lines_physical_tags = np.asarray(mesh["line_tags"])
+        line_connectivity = np.asarray(mesh["line"])
+
+        return {
+            name: line_connectivity[lines_physical_tags == tag]
+            for name, tag in config.boundary_tags.items()
+        }
 
 
 if __name__ == "__main__":
     mesh = FEMMesh()
     print(mesh.boundary_connectivity_matrices)
+    print(mesh.boundary_nodes)
+
+    print(f"Bandwidth: {mesh.get_bandwidth()}")
+    mesh.renumber()
+    print(f"Bandwidth after renumbering: {mesh.get_bandwidth()}")
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+
+# The arrays that are read from a msh file. Each one is stored in its own .npy file,
+# so that it can be memory mapped.
+MESH_ARRAYS = ["node_coords", "quad", "line", "line_tags"]
+
+
+def read_mesh_arrays(mesh_file_path, use_cache=True):
+    """Reads the arrays of a msh file: node coordinates, quad connectivity, line connectivity
+    and the physical tags of the lines.
+
+    Parsing a msh file with meshio is slow for large meshes. So, the arrays are also stored in a
+    cache directory next to the msh file (<mesh_file_path>.cache), as .npy files. The next runs
+    load them from there with mmap_mode="r": the data is only read from disk when it is used,
+    and it is read-only.
+
+    The cache belongs to a version of the msh file, identified by its size, modification time
+    and sha256 hash. If the size or the modification time differs, the hash is checked. So,
+    touching or copying the msh file does not invalidate the cache, but changing it does.
+
+    The cache is only an optimization. If it cannot be written, e.g. because the directory of the
+    msh file is read-only or the disk is full, a warning is given and the parsed arrays are returned.
+    """
+    if not use_cache:
+        return _read_msh_file(mesh_file_path)
+
+    cache_dir = mesh_file_path + ".cache"
+    key_path = os.path.join(cache_dir, "key.json")
+
+    stat = os.stat(mesh_file_path)
+    key = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    cached_key = None
+    if os.path.exists(key_path):
+        with open(key_path) as f:
+            cached_key = json.load(f)
+
+    if cached_key is not None:
+        is_valid = all(cached_key[name] == key[name] for name in key)
+
+        if not is_valid:
+            key["sha256"] = _hash_file(mesh_file_path)
+            is_valid = cached_key["sha256"] == key["sha256"]
+
+            if is_valid:
+                try:
+                    _write_key(key_path, key)
+                except OSError as e:
+                    # The cache stays valid, its hash is only checked again at the next run.
+                    warnings.warn(f"Could not update the mesh cache {cache_dir}: {e}")
+
+        if is_valid:
+            return {
+                name: np.load(os.path.join(cache_dir, name + ".npy"), mmap_mode="r")
+                for name in MESH_ARRAYS
+            }
+
+    arrays = _read_msh_file(mesh_file_path)
+
+    if "sha256" not in key:
+        key["sha256"] = _hash_file(mesh_file_path)
+    try:
+        _write_cache(cache_dir, key, arrays)
+    except OSError as e:
+        warnings.warn(f"Could not write the mesh cache {cache_dir}: {e}")
+
+    return arrays
+
+
+def _read_msh_file(mesh_file_path):
+    # meshio is only imported when a msh file has to be parsed, since importing it is slow.
+    import meshio
+
+    mesh = meshio.read(mesh_file_path)
+
+    return {
+        "node_coords": mesh.points[:, :2],
+        "quad": mesh.cells_dict["quad"],
+        "line": mesh.cells_dict["line"],
+        "line_tags": mesh.cell_data_dict["gmsh:physical"]["line"],
+    }
+
+
+def _write_cache(cache_dir, key, arrays):
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # The key is removed first and written last. If writing is interrupted,
+    # the cache has no key and is rebuilt at the next run.
+    key_path = os.path.join(cache_dir, "key.json")
+    if os.path.exists(key_path):
+        os.remove(key_path)
+
+    for name in MESH_ARRAYS:
+        np.save(
+            os.path.join(cache_dir, name + ".npy"), np.ascontiguousarray(arrays[name])
+        )
+
+    _write_key(key_path, key)
+
+
+def _write_key(key_path, key):
+    tmp_path = key_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(key, f)
+    os.replace(tmp_path, key_path)
+
+
+def _hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
@@ -1,5 +1,10 @@
 from .postprocess import (
     write_to_vtk,
     compute_stress_and_strain_at_nodes,
+    compute_state_at_nodes,
+    compute_field_at_nodes,
     compute_displacement_at_nodes,
+    plot_force_displacement,
 )
+from .xdmf_writer import XDMFTimeSeriesWriter
+from .async_writer import AsyncWriter
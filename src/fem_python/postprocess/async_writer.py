@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from fem_python import config
+
+# Put in the queue by close to stop the background thread.
+_STOP = object()
+
+
+class AsyncWriter:
+    """Runs the write_step of another writer (e.g. XDMFTimeSeriesWriter) on a background thread,
+    so that compressing and writing the fields of a time step overlaps with the Newton iterations
+    of the next time step.
+
+    write_step copies the fields into a snapshot and puts it in a queue. The background thread takes
+    the snapshots from the queue, in order, and writes them. The queue holds at most max_queue_size
+    snapshots. If writing is slower than the simulation, write_step blocks until there is space in
+    the queue. So, the memory used by the snapshots is bounded.
+
+    As the writer it wraps, it can be added as a step callback of a simulation:
+        with AsyncWriter(XDMFTimeSeriesWriter("outputs/plate_w_hole.xdmf", fem_mesh)) as writer:
+            simulation.add_step_callback(writer)
+            simulation.run()
+
+    stats:
+        queue_depth: number of snapshots in the queue when the last one was put in it.
+        max_queue_depth: largest queue_depth so far.
+        blocked_time: total time that write_step waited for space in the queue.
+        write_time: total time that the background thread spent writing.
+        num_steps: number of time steps that are written.
+    """
+
+    def __init__(self, writer, max_queue_size=None):
+        self.writer = writer
+
+        self._queue = queue.Queue(
+            config.output_queue_size if max_queue_size is None else max_queue_size
+        )
+        # An exception of the background thread is raised in the main thread,
+        # at every later call of write_step, flush or close.
+        self._error = None
+
+        self.stats = {
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "blocked_time": 0.0,
+            "write_time": 0.0,
+            "num_steps": 0,
+        }
+
+        self._thread = threading.Thread(
+            target=self._run, name="fem_python-writer", daemon=True
+        )
+        self._thread.start()
+
+    def __call__(self, simulation):
+        """Step callback of a simulation. The time steps to write are chosen by the wrapped writer."""
+        if self.writer.should_write(simulation):
+            self.write_step(simulation.time_step, simulation.get_nodal_fields())
+
+    def write_step(self, time_value, vecs_dict):
+        self._raise_error()
+
+        # The arrays may be modified by the simulation while they wait in the queue. So, they are copied.
+        snapshot = {}
+        for name, vec in vecs_dict.items():
+            snapshot[name] = np.array(vec)
+            snapshot[name].flags.writeable = False
+
+        start = time.perf_counter()
+        self._queue.put((time_value, snapshot))
+        self.stats["blocked_time"] += time.perf_counter() - start
+
+        self.stats["queue_depth"] = self._queue.qsize()
+        self.stats["max_queue_depth"] = max(
+            self.stats["max_queue_depth"], self.stats["queue_depth"]
+        )
+
+    def flush(self):
+        """Waits until all snapshots in the queue are written."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Writes the remaining snapshots and closes the wrapped writer. When it returns,
+        the output is complete on disk."""
+        if self._thread is None:
+            return
+
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+        self.writer.close()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+
+            try:
+                if item is _STOP:
+                    return
+
+                # After an error, the remaining snapshots are dropped, but still taken from the queue,
+                # so that the main thread never blocks on a full queue.
+                if self._error is None:
+                    start = time.perf_counter()
+                    self.writer.write_step(*item)
+                    self.stats["write_time"] += time.perf_counter() - start
+                    self.stats["num_steps"] += 1
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
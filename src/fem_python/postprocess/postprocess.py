@@ -1,72 +1,138 @@
-from typing import List
-
 import numpy as np
-import meshio
 
-from fem_python.fem.shape_functions import get_shape_function
 from fem_python.mesh import FEMMesh
-from fem_python.fem.integration import get_gauss_integration_setting
-from fem_python.fem.material_model import AbstractMaterialModel
-from fem_python import config
+from fem_python.fem.assembly_plan import get_assembly_plan
+from fem_python.fem.geometry import get_element_geometry
+from fem_python.fem.material_state import MaterialStateStore
 
 
 def compute_stress_and_strain_at_nodes(
-    fem_mesh: FEMMesh, materials: List[List[AbstractMaterialModel]]
+    fem_mesh: FEMMesh,
+    material_state: MaterialStateStore,
+    displacement_vec,
 ):
     """We interpolate the stress and strain at the nodes. The reason is that the
-    write_to_vtk function expects values at nodes. There should be more accurate ways to
-    visualize stress/strain fields.
+    write_to_vtk function expects values at nodes.
 
-    For each integration point, we compute the stress and strain. We then average the values.
+    The stress is taken from the committed material state. The strain is computed from the displacement
+    using the B matrices of the element geometry. See compute_field_at_nodes for how the values at the
+    integration points are brought to the nodes.
     """
-    integration_points = get_gauss_integration_setting(
-        num_int_points=config.num_integration_points
-    )
+    geometry = get_element_geometry(fem_mesh)
+    stress = material_state.committed["stress"]
+
+    element_displacement = displacement_vec[get_assembly_plan(fem_mesh).element_dofs]
+    strain = geometry.compute_strain(element_displacement)
 
-    # Note that each node is shared among multiple elements. The values of stress and
-    # strain can be different for each element. However, the true value of stress and strain at
-    # a node is unique. To estimate this unique value, we collect all stress and strain values
-    # contributed by neighboring elements and average them. This is not neccessary the most accurate way.
-    # But it most certainly is the simplest way.
-    node_stress = {n: [] for n in range(fem_mesh.num_nodes)}
-    node_strain = {n: [] for n in range(fem_mesh.num_nodes)}
+    stress_vec = compute_field_at_nodes(fem_mesh, stress)
+    strain_vec = compute_field_at_nodes(fem_mesh, strain)
 
-    for e in range(fem_mesh.num_elements):
-        for i, _ in enumerate(integration_points):
-            material = materials[e][i]
+    return stress_vec, strain_vec
 
-            nodes = fem_mesh.connectivity_matrix[e]
 
-            for node in nodes:
-                # node_strain[node].append(material.strain)
-                node_stress[node].append(material.state["stress"])
+def compute_state_at_nodes(fem_mesh: FEMMesh, material_state: MaterialStateStore):
+    """Brings every quantity of the committed material state (e.g. stress, or an internal variable
+    of the material model) to the nodes. Returns a dictionary with the same names."""
+    return {
+        name: compute_field_at_nodes(fem_mesh, value)
+        for name, value in material_state.committed.items()
+    }
 
-    stress_vec = np.zeros((fem_mesh.num_nodes, 3))
-    strain_vec = np.zeros((fem_mesh.num_nodes, 3))
 
-    for node in range(fem_mesh.num_nodes):
-        stress_vec[node] = np.mean(node_stress[node], axis=0)
-        strain_vec[node] = np.mean(node_strain[node], axis=0)
+def compute_field_at_nodes(fem_mesh: FEMMesh, values):
+    """Computes the values at nodes of a field that is known at the integration points.
 
-    return stress_vec, strain_vec
+    First, the values at the integration points of each element are extrapolated to the nodes of the
+    element with the extrapolation matrix of the element geometry. Note that each node is shared among
+    multiple elements, and each element gives a different value at the node. However, the true value at
+    a node is unique. To estimate this unique value, we average the values of the neighboring elements.
+    This is not neccessary the most accurate way. But it most certainly is the simplest way.
 
+    Args:
+        values (np.array): values at the integration points with the format of ExGx... .
 
-def compute_displacement_at_nodes(displacement_vec, fem_mesh: FEMMesh):
-    displacement = np.zeros((fem_mesh.num_nodes, 2))
+    Returns:
+        np.array: values at the nodes with the format of num_nodes x ... .
+    """
+    geometry = get_element_geometry(fem_mesh)
+
+    values = np.asarray(values)
+    value_shape = values.shape[2:]
+
+    # element_node_values[e, i] = sum_g extrapolation_matrix[i, g] values[e, g], with the format of Ex4xC
+    element_node_values = np.einsum(
+        "ig,egc->eic",
+        geometry.extrapolation_matrix,
+        values.reshape(values.shape[:2] + (-1,)),
+    )
+
+    # The values of all elements are summed at their nodes with a bincount per component,
+    # and divided by the number of elements that share the node.
+    nodes = fem_mesh.connectivity_matrix.ravel()
+    num_elements_per_node = np.bincount(nodes, minlength=fem_mesh.num_nodes)
+
+    element_node_values = element_node_values.reshape(len(nodes), -1)
+    node_values = np.stack(
+        [
+            np.bincount(nodes, weights=component, minlength=fem_mesh.num_nodes)
+            for component in element_node_values.T
+        ],
+        axis=-1,
+    )
+
+    # Nodes that are not connected to any element get zero.
+    node_values /= np.maximum(num_elements_per_node, 1)[:, None]
 
-    for node in range(fem_mesh.num_nodes):
-        dof_x = 2 * node
-        dof_y = 2 * node + 1
+    return node_values.reshape((fem_mesh.num_nodes,) + value_shape)
 
-        displacement[node] = [displacement_vec[dof_x], displacement_vec[dof_y]]
 
-    return displacement
+def compute_displacement_at_nodes(displacement_vec, fem_mesh: FEMMesh):
+    # The dofs of node n are 2n and 2n+1. So, the dof vector is the nodal displacement row by row.
+    return np.reshape(displacement_vec, (fem_mesh.num_nodes, 2)).copy()
 
 
 def write_to_vtk(vecs_dict, fem_mesh: FEMMesh):
+    # meshio is only imported when it is used, since importing it is slow.
+    import meshio
+
+    # The cells are in the original numbering of the mesh. If the mesh is renumbered,
+    # the values at nodes are mapped back to it.
     meshio.write_points_cells(
         "outputs/plate_w_hole.vtk",
-        fem_mesh.node_coords,
+        fem_mesh.to_original_numbering(fem_mesh.node_coords),
         fem_mesh.cells,
-        point_data=vecs_dict,
+        point_data={
+            name: fem_mesh.to_original_numbering(vec) for name, vec in vecs_dict.items()
+        },
+    )
+
+
+def plot_force_displacement(force_displacement, file_path=None):
+    """Plots the force displacement curve at the right boundary. If file_path is given, the plot is
+    saved there instead of shown, which does not need a display (e.g. batch runs).
+
+    matplotlib is only imported when it is used, since importing it is slow."""
+    if file_path is None:
+        import matplotlib.pyplot as plt
+
+        figure = plt.figure()
+    else:
+        # A figure made without pyplot does not need a GUI backend.
+        from matplotlib.figure import Figure
+
+        figure = Figure()
+
+    axes = figure.add_subplot()
+    axes.plot(
+        force_displacement["displacement"],
+        force_displacement["force"],
+        marker="o",
     )
+    axes.set_xlabel("Displacement at right boundary")
+    axes.set_ylabel("Force at right boundary")
+    axes.set_title("1D Bar Problem")
+
+    if file_path is None:
+        plt.show()
+    else:
+        figure.savefig(file_path)
@@ -0,0 +1,269 @@
+import os
+
+import numpy as np
+
+from fem_python.mesh import FEMMesh
+from fem_python import config
+
+
+class XDMFTimeSeriesWriter:
+    """Writes the fields at nodes of several time steps to an XDMF file, which can be opened in ParaView.
+
+    The XDMF file (<name>.xdmf) is a small text file that only describes the data. The data itself is
+    binary, in an HDF5 file next to it (<name>.h5). The mesh (node coordinates and connectivity) is
+    written once, and all time steps refer to it. Each time step only adds its fields, as chunked and
+    gzip compressed datasets. The XDMF file is rewritten after each time step, so that the steps that
+    are already written can be viewed while the simulation is still running.
+
+    The writer can be added as a step callback of a simulation. Then, every output_frequency-th time step
+    and the last time step are written:
+        with XDMFTimeSeriesWriter("outputs/plate_w_hole.xdmf", fem_mesh) as writer:
+            simulation.add_step_callback(writer)
+            simulation.run()
+
+    After a restart from a checkpoint, restart_time_step is the time step of the checkpoint. Then, the
+    files of the earlier run are continued: the time steps up to restart_time_step are kept, and the ones
+    after it are removed, since the simulation computes them again. If the files do not exist, they are
+    written from the start.
+
+    The HDF5 file is only open while a time step is written, and closed after it. In between, other
+    programs can open it, e.g. ParaView or h5py, to look at the steps that are written so far. HDF5 locks
+    the file while it is open, so a reader has to close it again before the next time step is written,
+    otherwise the simulation fails with an OSError. The file is written with h5py, which is an optional
+    dependency.
+    """
+
+    def __init__(
+        self,
+        file_path,
+        fem_mesh: FEMMesh,
+        output_frequency=None,
+        compression_level=None,
+        restart_time_step=None,
+    ):
+        _import_h5py()
+
+        self.fem_mesh = fem_mesh
+        self.output_frequency = (
+            config.output_frequency if output_frequency is None else output_frequency
+        )
+        self.compression_level = (
+            config.output_compression_level
+            if compression_level is None
+            else compression_level
+        )
+
+        self.xdmf_path = file_path
+        self.h5_path = os.path.splitext(file_path)[0] + ".h5"
+
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # The steps that are written so far, as (time, {field name: (dataset path, (shape, dtype))}).
+        self._steps = []
+        self._is_closed = False
+
+        # As in write_to_vtk, the mesh is written in its original numbering. If the mesh is renumbered,
+        # the values at nodes are mapped back to it.
+        node_coords = fem_mesh.to_original_numbering(fem_mesh.node_coords)
+        connectivity_matrix = dict(fem_mesh.cells)["quad"]
+
+        if restart_time_step is not None and os.path.exists(self.h5_path):
+            self._continue_h5_file(restart_time_step, node_coords, connectivity_matrix)
+            self._write_xdmf()
+        else:
+            with self._open_h5_file("w") as h5_file:
+                self._mesh = {
+                    "geometry": self._write_dataset(
+                        h5_file, "mesh/geometry", node_coords
+                    ),
+                    "topology": self._write_dataset(
+                        h5_file, "mesh/topology", connectivity_matrix
+                    ),
+                }
+
+    def __call__(self, simulation):
+        """Step callback of a simulation."""
+        if self.should_write(simulation):
+            self.write_step(simulation.time_step, simulation.get_nodal_fields())
+
+    def should_write(self, simulation):
+        return (
+            simulation.time_step % self.output_frequency == 0 or simulation.is_finished
+        )
+
+    def write_step(self, time, vecs_dict):
+        """Writes the fields of a time step. vecs_dict maps the name of each field to its values
+        at nodes, with the format of num_nodes x ... (e.g. the output of get_nodal_fields).
+        """
+        step_index = len(self._steps)
+
+        fields = {}
+        with self._open_h5_file("a") as h5_file:
+            group_name = f"step_{step_index:06d}"
+            # The time is stored in the HDF5 file too, for continuing it after a restart.
+            h5_file.require_group(group_name).attrs["time"] = time
+
+            for name, vec in vecs_dict.items():
+                path = f"{group_name}/{name}"
+                values = self.fem_mesh.to_original_numbering(vec)
+                fields[name] = (path, self._write_dataset(h5_file, path, values))
+
+        self._steps.append((time, fields))
+
+        # The XDMF file is only rewritten after the HDF5 file is closed, so it never refers to
+        # datasets that are not complete in the file.
+        self._write_xdmf()
+
+    def close(self):
+        """When it returns, both files are complete on disk."""
+        if not self._is_closed:
+            self._is_closed = True
+
+            for path in [self.h5_path, self.xdmf_path]:
+                if os.path.exists(path):
+                    _fsync(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _continue_h5_file(self, restart_time_step, node_coords, connectivity_matrix):
+        with self._open_h5_file("a") as h5_file:
+            geometry = h5_file["mesh/geometry"]
+            topology = h5_file["mesh/topology"]
+            if not (
+                np.array_equal(geometry[()], node_coords)
+                and np.array_equal(topology[()], connectivity_matrix)
+            ):
+                raise ValueError(
+                    f"The time series {self.h5_path} was written for a different mesh."
+                )
+            self._mesh = {
+                "geometry": (geometry.shape, geometry.dtype),
+                "topology": (topology.shape, topology.dtype),
+            }
+
+            # The step groups are numbered in the order that they are written, so the ones after
+            # restart_time_step are the last ones. Removing them leaves the numbering contiguous.
+            for group_name in sorted(name for name in h5_file if name != "mesh"):
+                group = h5_file[group_name]
+                time = group.attrs["time"]
+
+                if time > restart_time_step:
+                    del h5_file[group_name]
+                    continue
+
+                fields = {
+                    name: (f"{group_name}/{name}", (dataset.shape, dataset.dtype))
+                    for name, dataset in group.items()
+                }
+                self._steps.append((time.item(), fields))
+
+    def _open_h5_file(self, mode):
+        return _import_h5py().File(self.h5_path, mode)
+
+    def _write_dataset(self, h5_file, path, values):
+        values = np.ascontiguousarray(values)
+
+        # Each dataset is split in chunks of about 1 MB along the nodes. Chunks are the unit of compression,
+        # so a reader only decompresses the chunks that it needs.
+        row_size = max(values[:1].nbytes, 1)
+        chunks = (max(min(len(values), (1 << 20) // row_size), 1),) + values.shape[1:]
+
+        h5_file.create_dataset(
+            path,
+            data=values,
+            chunks=chunks if len(values) > 0 else None,
+            compression="gzip" if self.compression_level > 0 else None,
+            compression_opts=(
+                self.compression_level if self.compression_level > 0 else None
+            ),
+        )
+
+        return values.shape, values.dtype
+
+    def _write_xdmf(self):
+        h5_name = os.path.basename(self.h5_path)
+
+        geometry_shape, geometry_dtype = self._mesh["geometry"]
+        topology_shape, topology_dtype = self._mesh["topology"]
+
+        lines = [
+            '<?xml version="1.0"?>',
+            '<Xdmf Version="3.0" xmlns:xi="http://www.w3.org/2001/XInclude">',
+            "  <Domain>",
+            # The mesh is written once and every time step refers to it.
+            '    <Grid Name="mesh" GridType="Uniform">',
+            f'      <Topology TopologyType="Quadrilateral" NumberOfElements="{topology_shape[0]}">',
+            _make_data_item(h5_name, "mesh/topology", topology_shape, topology_dtype),
+            "      </Topology>",
+            '      <Geometry GeometryType="XY">',
+            _make_data_item(h5_name, "mesh/geometry", geometry_shape, geometry_dtype),
+            "      </Geometry>",
+            "    </Grid>",
+            '    <Grid Name="time_series" GridType="Collection" CollectionType="Temporal">',
+        ]
+
+        for time, fields in self._steps:
+            lines += [
+                '      <Grid GridType="Uniform">',
+                "        <xi:include xpointer=\"xpointer(//Grid[@Name='mesh']/*[self::Topology or self::Geometry])\"/>",
+                f'        <Time Value="{time}"/>',
+            ]
+            for name, (path, (shape, dtype)) in fields.items():
+                lines += [
+                    f'        <Attribute Name="{name}" AttributeType="{_get_attribute_type(shape)}" Center="Node">',
+                    _make_data_item(h5_name, path, shape, dtype),
+                    "        </Attribute>",
+                ]
+            lines.append("      </Grid>")
+
+        lines += ["    </Grid>", "  </Domain>", "</Xdmf>", ""]
+
+        # The file is written to a temporary file first, and then renamed. So, a reader never sees
+        # a partially written file.
+        tmp_path = self.xdmf_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines))
+        os.replace(tmp_path, self.xdmf_path)
+
+
+def _import_h5py():
+    try:
+        import h5py
+    except ImportError as e:
+        raise ImportError(
+            "The XDMF writer requires h5py. Install it or use write_to_vtk."
+        ) from e
+
+    return h5py
+
+
+def _make_data_item(h5_name, path, shape, dtype):
+    dimensions = " ".join(str(n) for n in shape)
+    number_type = "Int" if np.issubdtype(dtype, np.integer) else "Float"
+    return (
+        f'        <DataItem Dimensions="{dimensions}" NumberType="{number_type}" '
+        f'Precision="{np.dtype(dtype).itemsize}" Format="HDF">{h5_name}:/{path}</DataItem>'
+    )
+
+
+def _get_attribute_type(shape):
+    if len(shape) == 1:
+        return "Scalar"
+    if len(shape) == 2 and shape[1] in (2, 3):
+        return "Vector"
+    return "Matrix"
+
+
+def _fsync(path):
+    # Closing a file only hands its data to the operating system. fsync waits until it is on the disk.
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
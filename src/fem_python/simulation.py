@@ -0,0 +1,400 @@
+import numpy as np
+
+from fem_python.fem import (
+    make_stiffness_matrix_and_internal_force_vector,
+    make_internal_force_vector,
+    get_solver,
+    apply_dirichlet_boundary_condition,
+    apply_dirichlet_boundary_condition_to_residual,
+    condense_dirichlet_boundary_condition,
+    expand_free_displacement,
+    get_constrained_dofs,
+    get_material_model,
+    MaterialStateStore,
+    get_nonlinear_strategy,
+    get_load_stepping,
+)
+from fem_python.fem.geometry import get_element_geometry
+from fem_python.mesh.mesh import FEMMesh
+from fem_python.postprocess import (
+    compute_stress_and_strain_at_nodes,
+    compute_state_at_nodes,
+    compute_displacement_at_nodes,
+)
+from fem_python import config
+
+
+class ConvergenceError(Exception):
+    """Raised when the Newton method does not converge in a time step."""
+
+    pass
+
+
+class Simulation:
+    """Runs the analysis of a mesh: the prescribed displacement at the right boundary is applied
+    in time steps, and the equilibrium of each time step is found with the Newton method.
+    The load stepping decides the size of the time steps (see get_load_stepping). The fraction of the
+    prescribed displacement that is applied so far is the load factor.
+
+    Arguments that are not given are taken from the config module. The arguments are read once,
+    when the simulation is made. So, several simulations with different values of the arguments can
+    live in the same process. The same holds for the settings of the solver, the nonlinear strategy,
+    the load stepping and the material model (e.g. config.plane_stress), which are read from the config
+    module when they are made, here.
+
+    The other settings are not per simulation. The assembly (config.assembly_mode and
+    config.num_assembly_threads) and the element geometry (config.num_integration_points and
+    config.element_type) read the config module whenever they are used, so they are shared by all
+    simulations of the process. The mesh is made before the simulation, with the config module at that
+    time. The boundary conditions are not a setting: they are always the ones of ConstrainedDofs,
+    on the boundary groups of the mesh.
+
+    What is expensive to set up is kept between runs: the mesh (with its assembly plan, element
+    geometry and constrained dofs), the solver (with the ordering of the stiffness matrix), and the
+    factorization of the nonlinear strategy. Calling run again starts the analysis from the
+    undeformed state, without setting these up again.
+
+    Callbacks:
+        add_iteration_callback: callback(simulation, iter_num, residual_norm) is called after
+                                each Newton iteration.
+        add_step_callback: callback(simulation) is called after each converged time step.
+    """
+
+    def __init__(
+        self,
+        fem_mesh: FEMMesh,
+        material_model_name=None,
+        elasticity_module=None,
+        poission_ratio=None,
+        prescribed_displacement_x=None,
+        num_time_steps=None,
+        max_num_nr_iterations=None,
+        solver_name=None,
+        nonlinear_strategy_name=None,
+        dirichlet_method=None,
+        load_stepping_name=None,
+        residual_tolerance=1e-6,
+        verbose=True,
+    ):
+        self.fem_mesh = fem_mesh
+
+        self.material_model_name = (
+            config.material_model_name
+            if material_model_name is None
+            else material_model_name
+        )
+        self.elasticity_module = (
+            config.bar_elasticity_module
+            if elasticity_module is None
+            else elasticity_module
+        )
+        self.poission_ratio = (
+            config.bar_poission_ratio if poission_ratio is None else poission_ratio
+        )
+        self.prescribed_displacement_x = (
+            config.prescribed_displacement_at_right_boundary_x
+            if prescribed_displacement_x is None
+            else prescribed_displacement_x
+        )
+        self.num_time_steps = (
+            config.num_time_steps if num_time_steps is None else num_time_steps
+        )
+        self.max_num_nr_iterations = (
+            config.max_num_nr_iterations
+            if max_num_nr_iterations is None
+            else max_num_nr_iterations
+        )
+        self.dirichlet_method = (
+            config.dirichlet_method if dirichlet_method is None else dirichlet_method
+        )
+        self.load_stepping_name = (
+            config.load_stepping_name
+            if load_stepping_name is None
+            else load_stepping_name
+        )
+        self.residual_tolerance = residual_tolerance
+        self.verbose = verbose
+
+        if self.dirichlet_method not in ("elimination", "condensation"):
+            raise NotImplementedError(
+                f"Dirichlet method {self.dirichlet_method} is not implemented."
+            )
+
+        # Note each element, in principle, is allowed to have a different material model.
+        # Here, all elements share the same material model. The material model computes stress and stiffeness matrix
+        # for all integration points of all elements at once. The state of each integration point (e.g. stress)
+        # is kept in the material state store, as one array per quantity.
+        self.material = get_material_model(
+            self.material_model_name,
+            elasticity_module=self.elasticity_module,
+            poission_ratio=self.poission_ratio,
+        )
+
+        # The solver lives during the whole simulation, so that it can reuse what only depends on the
+        # sparsity pattern of the stiffness matrix (e.g. the fill-reducing ordering).
+        self.solver = get_solver(
+            config.solver_name if solver_name is None else solver_name
+        )
+
+        # The nonlinear strategy decides when the stiffness matrix is factorized.
+        self.strategy = get_nonlinear_strategy(
+            (
+                config.nonlinear_strategy_name
+                if nonlinear_strategy_name is None
+                else nonlinear_strategy_name
+            ),
+            self.solver,
+        )
+
+        self.load_stepping = get_load_stepping(
+            self.load_stepping_name, self.num_time_steps
+        )
+
+        self._iteration_callbacks = []
+        self._step_callbacks = []
+
+        self.reset()
+
+    def add_iteration_callback(self, callback):
+        self._iteration_callbacks.append(callback)
+
+    def add_step_callback(self, callback):
+        self._step_callbacks.append(callback)
+
+    def reset(self):
+        """Goes back to the undeformed state, before the first time step."""
+        self.material_state = MaterialStateStore(
+            self.material.initial_state,
+            self.fem_mesh.num_elements,
+            get_element_geometry(self.fem_mesh).num_integration_points,
+        )
+
+        # total_displacement_vec is the total displacement vector at time step t.
+        # At each time step, the increment of the displacement is added to the total displacement vector.
+        self.total_displacement_vec = np.zeros((self.fem_mesh.num_nodes * 2,))
+        self.internal_force_vec = np.zeros_like(self.total_displacement_vec)
+
+        self.time_step = 0
+        self.load_factor = 0.0
+        self.load_stepping.reset()
+
+        # It is usually of interest to keep track of a quantity of interest. In the 1D bar problem,
+        # we are interested in the force and displacement at the right boundary. We keep track of
+        # how the internal force increases as we increase the displacement.
+        self.force_displacement_right_boundary = {"force": [0], "displacement": [0]}
+
+    def run(self):
+        """Runs all time steps from the undeformed state and returns the force displacement curve
+        at the right boundary."""
+        self.reset()
+
+        return self.resume()
+
+    @property
+    def is_finished(self):
+        return self.load_stepping.is_finished(self.time_step, self.load_factor)
+
+    def resume(self):
+        """Runs the remaining time steps from the current state, e.g. after loading a checkpoint,
+        and returns the force displacement curve at the right boundary."""
+        while not self.is_finished:
+            self.step()
+
+        return self.force_displacement_right_boundary
+
+    def step(self):
+        """Runs one time step. If the Newton method does not converge, the load stepping may cut back
+        the increment, and the time step is retried from its begining. Otherwise, ConvergenceError is raised.
+        In that case, the state of the simulation is the one at the begining of the time step.
+        """
+        while True:
+            load_factor_increment = self.load_stepping.get_increment(self.load_factor)
+
+            try:
+                increment_displacement_vec, num_iterations = self._solve_time_step(
+                    load_factor_increment * self.prescribed_displacement_x
+                )
+                break
+            except ConvergenceError:
+                # Nothing is committed before the time step converges. So, the time step can simply be retried.
+                if not self.load_stepping.cut_back(load_factor_increment):
+                    raise
+
+                if self.verbose:
+                    print(
+                        f"Time step: {self.time_step}, cutting back the load factor increment "
+                        f"to {self.load_stepping.load_factor_increment:.3g}"
+                    )
+
+        self.load_stepping.converged(num_iterations)
+
+        self.total_displacement_vec += increment_displacement_vec
+        self.material_state.save_state()
+        self.time_step += 1
+        self.load_factor += load_factor_increment
+
+        # Collecting the force and displacement at the right boundary. The force and the displacement vectors on the right boundary
+        # are averaged out. This is because the right boundary is made up of multiple nodes. This is again not the most accurate way of
+        # computing the force but, it is quite simple.
+        dofs_ux = get_constrained_dofs(self.fem_mesh).prescribed_dofs
+
+        self.force_displacement_right_boundary["force"].append(
+            np.sum(self.internal_force_vec[dofs_ux])
+        )
+        self.force_displacement_right_boundary["displacement"].append(
+            np.mean(self.total_displacement_vec[dofs_ux])
+        )
+
+        for callback in self._step_callbacks:
+            callback(self)
+
+    def get_nodal_fields(self):
+        """Returns the fields at nodes, e.g. to write them to a vtk file."""
+        stress_vec, strain_vec = compute_stress_and_strain_at_nodes(
+            self.fem_mesh, self.material_state, self.total_displacement_vec
+        )
+
+        # The other quantities of the material state, e.g. internal variables, are written as well.
+        state_vecs = compute_state_at_nodes(self.fem_mesh, self.material_state)
+
+        return {
+            **state_vecs,
+            "stress": stress_vec,
+            "strain": strain_vec,
+            "displacement": compute_displacement_at_nodes(
+                self.total_displacement_vec, self.fem_mesh
+            ),
+            "internal_force": compute_displacement_at_nodes(
+                self.internal_force_vec, self.fem_mesh
+            ),
+        }
+
+    def _solve_time_step(self, displacement_step_x):
+        """Finds the increment of the displacement of the time step with the Newton method.
+
+        increment_displacement_vec nonlinearly depend on material property and external force. So,
+        we compute it incrementally. At each Newton iteration, iteration_displacement_vec is added to
+        the increment_displacement_vec until equilibrium is reached, namely the residual becomes effectively zero.
+
+        Returns the increment of the displacement and the number of Newton iterations it took.
+        """
+        fem_mesh = self.fem_mesh
+        strategy = self.strategy
+
+        increment_displacement_vec = np.zeros_like(self.total_displacement_vec)
+        strategy.begin_time_step()
+
+        for iter_num in range(self.max_num_nr_iterations):
+            # Note that the stiffness matrix and the internal vector depend on history until the begining of the time step
+            # and the increment of the displacement. The increment of displacement gives us the increment of strain
+            # which in turn gives us the increment of the stress and the stiffness matrix.
+            # If the strategy reuses an earlier factorization, the stiffness matrix is not needed and only
+            # the internal force vector is computed.
+            #
+            # There are no external forces. So, the residual is the negative of the internal force vector.
+            # Newton method solves stiffness_mat * iteration_displacement_vec = residual_vec.
+            needs_stiffness = strategy.needs_stiffness(iter_num)
+
+            # self._stiffness_mat is kept from the last iteration that assembled it. When a factorization is
+            # reused, it is the stiffness matrix that the factorization was made from.
+            if needs_stiffness:
+                self._stiffness_mat, internal_force_vec = (
+                    make_stiffness_matrix_and_internal_force_vector(
+                        fem_mesh,
+                        increment_displacement_vec,
+                        self.material,
+                        self.material_state,
+                    )
+                )
+            else:
+                internal_force_vec = make_internal_force_vector(
+                    fem_mesh,
+                    increment_displacement_vec,
+                    self.material,
+                    self.material_state,
+                )
+
+            # With condensation, the linear system (and so the nonlinear strategy) only sees the free dofs.
+            if self.dirichlet_method == "condensation":
+                constrained_stiffness_mat, residual_vec, constrained_increment = (
+                    condense_dirichlet_boundary_condition(
+                        fem_mesh,
+                        self._stiffness_mat,
+                        -internal_force_vec,
+                        displacement_step_x,
+                        increment_displacement_vec,
+                        condense_stiffness=needs_stiffness,
+                    )
+                )
+            elif needs_stiffness:
+                constrained_stiffness_mat, residual_vec = (
+                    apply_dirichlet_boundary_condition(
+                        fem_mesh,
+                        self._stiffness_mat,
+                        -internal_force_vec,
+                        displacement_step_x,
+                        iter_num,
+                        increment_displacement_vec,
+                    )
+                )
+            else:
+                constrained_stiffness_mat = None
+                residual_vec = apply_dirichlet_boundary_condition_to_residual(
+                    fem_mesh,
+                    self._stiffness_mat,
+                    -internal_force_vec,
+                    displacement_step_x,
+                    increment_displacement_vec,
+                )
+
+            iteration_displacement_vec = strategy.compute_iteration(
+                constrained_stiffness_mat, residual_vec, iter_num
+            )
+            if self.dirichlet_method == "condensation":
+                iteration_displacement_vec = expand_free_displacement(
+                    fem_mesh, iteration_displacement_vec, constrained_increment
+                )
+            increment_displacement_vec += iteration_displacement_vec
+
+            residual_norm = np.linalg.norm(residual_vec)
+
+            if self.verbose:
+                self._print_iteration(iter_num, residual_norm)
+
+            for callback in self._iteration_callbacks:
+                callback(self, iter_num, residual_norm)
+
+            # A diverging Newton method does not recover.
+            if not np.isfinite(residual_norm):
+                break
+
+            if residual_norm < self.residual_tolerance:
+                # The boundary conditions are applied to a copy of the residual. So, internal_force_vec still holds
+                # the internal force of the last iteration, which is computed from the material state that is saved
+                # at the end of the time step. Its values at the prescribed dofs are the reaction forces.
+                # For linear materials, these are K_pf u.
+                self.internal_force_vec = internal_force_vec
+                return increment_displacement_vec, iter_num + 1
+
+        raise ConvergenceError("Newton method failed to converge")
+
+    def _print_iteration(self, iter_num, residual_norm):
+        solver_report = f"Solve time: {self.strategy.stats['solve_time']:.3g}s"
+        if self.strategy.stats["factorized"]:
+            solver_report += " (factorized)"
+        if self.solver.stats["iterations"] is not None:
+            solver_report += f", Linear iterations: {self.solver.stats['iterations']}"
+
+        print(
+            f"Time step: {self.time_step}, Load factor: {self.load_factor:.3g}, Iteration: {iter_num}, "
+            f"Residual: {residual_norm}, {solver_report}"
+        )
+
+
+if __name__ == "__main__":
+    # The mesh is loaded once. The second simulation reuses its assembly plan and element geometry.
+    fem_mesh = FEMMesh()
+
+    for poission_ratio in [0.0, 0.3]:
+        simulation = Simulation(fem_mesh, poission_ratio=poission_ratio, verbose=False)
+        print(poission_ratio, simulation.run()["force"])
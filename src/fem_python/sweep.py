@@ -0,0 +1,284 @@
+import itertools
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from fem_python.mesh.mesh import FEMMesh
+from fem_python.simulation import Simulation, ConvergenceError
+from fem_python import config
+
+# The arrays of the mesh that the workers need. The boundaries are stored as "boundary_<name>".
+_MESH_ARRAYS = ["node_coords", "connectivity_matrix"]
+
+# The mesh of a worker process. It is made once per worker, so that its assembly plan and
+# element geometry are reused by all cases that the worker runs.
+_worker_mesh = None
+_worker_shared_memories = []
+
+
+def make_cases(**grid):
+    """Makes all combinations of the given values, e.g.
+    make_cases(poission_ratio=[0, 0.3], elasticity_module=[1, 2]) gives 4 cases.
+    The keys are arguments of Simulation."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def run_sweep(
+    fem_mesh: FEMMesh, cases, output_path, num_workers=None, **simulation_kwargs
+):
+    """Runs a simulation for each case and collects the force displacement curves at the right
+    boundary into a single npz file with one column per quantity:
+        case_id: index of the case in cases.
+        one column per argument of the cases, e.g. poission_ratio.
+        converged: False if the Newton method failed at some time step.
+        force, displacement: the curves, with the format of num_cases x (num_time_steps + 1).
+                             Time steps that were not reached are NaN. With adaptive load stepping,
+                             the number of time steps differs between cases, and the curves are
+                             as long as the longest one.
+
+    The mesh is loaded once, by the caller. Its arrays are put in shared memory, and the worker
+    processes make their meshes from them without copying. The cases are distributed over a pool
+    of num_workers processes (all cpus by default). simulation_kwargs are passed to all simulations.
+    The settings of the config module, as the caller has set them, are copied to the workers. So, the
+    settings that are not arguments of Simulation (e.g. config.assembly_mode) are the same in the
+    workers, also when they are started with spawn or forkserver, which import the config module again.
+
+    Each finished case is written to its own file in <output_path>.parts. If the sweep is interrupted,
+    running it again with the same cases only runs the cases that have not finished yet.
+    The part files are removed once the result file is written.
+    """
+    parts_dir = output_path + ".parts"
+    os.makedirs(parts_dir, exist_ok=True)
+
+    results = {}
+    pending_case_ids = []
+    for case_id, case in enumerate(cases):
+        result = _read_part(parts_dir, case_id, case)
+        if result is None:
+            pending_case_ids.append(case_id)
+        else:
+            results[case_id] = result
+
+    if results:
+        print(f"Resuming: {len(results)} of {len(cases)} cases are already done")
+
+    if pending_case_ids:
+        shared_memories, shared_arrays = _share_mesh(fem_mesh)
+
+        try:
+            start = time.perf_counter()
+
+            with ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=_init_worker,
+                initargs=(shared_arrays, _get_config_settings()),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _run_case, case_id, cases[case_id], simulation_kwargs
+                    )
+                    for case_id in pending_case_ids
+                ]
+
+                for num_done, future in enumerate(as_completed(futures), start=1):
+                    case_id, result = future.result()
+
+                    _write_part(parts_dir, case_id, cases[case_id], result)
+                    results[case_id] = result
+
+                    elapsed = time.perf_counter() - start
+                    print(
+                        f"{num_done}/{len(pending_case_ids)} cases, "
+                        f"{num_done / elapsed:.2f} cases/s"
+                    )
+        finally:
+            for shm in shared_memories:
+                shm.close()
+                shm.unlink()
+
+    _write_results(output_path, cases, results)
+    shutil.rmtree(parts_dir)
+
+    return output_path
+
+
+def _share_mesh(fem_mesh: FEMMesh):
+    """Copies the arrays of the mesh to shared memory. Returns the shared memory blocks, which
+    the caller must release, and the description of the arrays that the workers need to attach to them.
+    """
+    arrays = {name: getattr(fem_mesh, name) for name in _MESH_ARRAYS}
+    for name, boundary in fem_mesh.boundary_connectivity_matrices.items():
+        arrays["boundary_" + name] = boundary
+
+    shared_memories = []
+    shared_arrays = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+
+        # Empty blocks are not allowed.
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+
+        shared_memories.append(shm)
+        shared_arrays[name] = (shm.name, array.shape, array.dtype.str)
+
+    return shared_memories, shared_arrays
+
+
+def _get_config_settings():
+    return {
+        name: value for name, value in vars(config).items() if not name.startswith("_")
+    }
+
+
+def _init_worker(shared_arrays, config_settings):
+    global _worker_mesh
+
+    for name, value in config_settings.items():
+        setattr(config, name, value)
+
+    arrays = {}
+    for name, (shm_name, shape, dtype) in shared_arrays.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        # The block must stay open as long as the arrays are used.
+        _worker_shared_memories.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    boundary_connectivity_matrices = {
+        name[len("boundary_") :]: array
+        for name, array in arrays.items()
+        if name.startswith("boundary_")
+    }
+
+    _worker_mesh = FEMMesh.from_arrays(
+        arrays["node_coords"],
+        arrays["connectivity_matrix"],
+        boundary_connectivity_matrices,
+    )
+
+
+def _run_case(case_id, case, simulation_kwargs):
+    simulation = Simulation(
+        _worker_mesh, **{**simulation_kwargs, **case}, verbose=False
+    )
+
+    # Only a Newton method that does not converge is a result of the case. Any other exception is a bug,
+    # and it stops the sweep.
+    converged = True
+    try:
+        simulation.run()
+    except ConvergenceError as e:
+        print(f"Case {case_id} failed at time step {simulation.time_step}: {e}")
+        converged = False
+
+    curve = simulation.force_displacement_right_boundary
+
+    # The curve has a point for each time step, and one for the undeformed state.
+    # With adaptive load stepping, there may be more time steps than num_time_steps.
+    num_points = max(simulation.num_time_steps + 1, len(curve["force"]))
+    force = np.full((num_points,), np.nan)
+    displacement = np.full((num_points,), np.nan)
+    force[: len(curve["force"])] = curve["force"]
+    displacement[: len(curve["displacement"])] = curve["displacement"]
+
+    return case_id, {
+        "converged": converged,
+        "force": force,
+        "displacement": displacement,
+    }
+
+
+def _get_part_path(parts_dir, case_id):
+    return os.path.join(parts_dir, f"case_{case_id:06d}.npz")
+
+
+def _write_part(parts_dir, case_id, case, result):
+    # The part is written to a temporary file first, and then renamed. Renaming is atomic.
+    # So, an interrupted write never leaves a part that looks finished.
+    path = _get_part_path(parts_dir, case_id)
+    tmp_path = path + ".tmp.npz"
+
+    np.savez(
+        tmp_path,
+        case_names=np.array(list(case), dtype=str),
+        case_values=np.array([str(value) for value in case.values()], dtype=str),
+        **result,
+    )
+    os.replace(tmp_path, path)
+
+
+def _read_part(parts_dir, case_id, case):
+    """Returns the result of a finished case, or None if the case has to be run.
+    A part that was written for different parameters (e.g. the cases changed) is ignored.
+    """
+    path = _get_part_path(parts_dir, case_id)
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path) as part:
+        if list(part["case_names"]) != list(case) or list(part["case_values"]) != [
+            str(value) for value in case.values()
+        ]:
+            return None
+
+        return {
+            "converged": bool(part["converged"]),
+            "force": part["force"],
+            "displacement": part["displacement"],
+        }
+
+
+def _write_results(output_path, cases, results):
+    columns = {"case_id": np.arange(len(cases))}
+
+    # Cases may set different arguments. A case without an argument gets an empty value.
+    names = list(dict.fromkeys(name for case in cases for name in case))
+    for name in names:
+        values = [case.get(name) for case in cases]
+        if all(isinstance(value, (int, float)) for value in values):
+            columns[name] = np.array(values, dtype=float)
+        else:
+            columns[name] = np.array(
+                ["" if value is None else str(value) for value in values]
+            )
+
+    columns["converged"] = np.array(
+        [results[case_id]["converged"] for case_id in range(len(cases))]
+    )
+
+    # Cases may have different numbers of time steps. Shorter curves are padded with NaN.
+    num_points = max(len(result["force"]) for result in results.values())
+    for name in ["force", "displacement"]:
+        column = np.full((len(cases), num_points), np.nan)
+        for case_id, result in results.items():
+            column[case_id, : len(result[name])] = result[name]
+        columns[name] = column
+
+    tmp_path = output_path + ".tmp.npz"
+    np.savez(tmp_path, **columns)
+    os.replace(tmp_path, output_path)
+
+
+if __name__ == "__main__":
+    fem_mesh = FEMMesh()
+
+    cases = make_cases(
+        material_model_name=["linear_elastic", "nonlinear_elastic"],
+        elasticity_module=[1, 2],
+        poission_ratio=[0.0, 0.2, 0.3],
+        prescribed_displacement_x=[1, 15],
+    )
+
+    start = time.perf_counter()
+    output_path = run_sweep(fem_mesh, cases, "outputs/sweep.npz")
+    print(
+        f"{len(cases)} cases in {time.perf_counter() - start:.2f}s, written to {output_path}"
+    )
+
+    with np.load(output_path) as results:
+        print({name: results[name].shape for name in results.files})
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from fem_python.fem.assembly_plan import make_submatrix_map
+from fem_python.mesh import make_structured_mesh
+from fem_python.simulation import Simulation
+
+
+def run(solver_name, dirichlet_method):
+    simulation = Simulation(
+        make_structured_mesh(6, 4),
+        material_model_name="nonlinear_elastic",
+        elasticity_module=1,
+        poission_ratio=0.3,
+        prescribed_displacement_x=0.3,
+        num_time_steps=3,
+        solver_name=solver_name,
+        dirichlet_method=dirichlet_method,
+        verbose=False,
+    )
+    return simulation.run()
+
+
+@pytest.mark.parametrize("solver_name", ["superlu", "dense"])
+def test_condensation_gives_the_same_curve_as_elimination(solver_name):
+    elimination = run(solver_name, "elimination")
+    condensation = run(solver_name, "condensation")
+
+    np.testing.assert_allclose(
+        condensation["displacement"], elimination["displacement"]
+    )
+    np.testing.assert_allclose(condensation["force"], elimination["force"], rtol=1e-10)
+
+
+@pytest.mark.parametrize("format", ["csr", "csc"])
+def test_submatrix_map_matches_slicing(format):
+    rng = np.random.default_rng(0)
+    matrix = sparse.random(12, 12, density=0.3, format="csr", random_state=rng)
+    rows = rng.permutation(12)[:8]
+    cols = np.sort(rng.permutation(12)[:7])
+
+    data_map, indices, indptr = make_submatrix_map(matrix, rows, cols, format)
+
+    # Another matrix with the same pattern, as at the next Newton iteration.
+    matrix.data = rng.uniform(1, 2, matrix.nnz)
+    submatrix = sparse.csr_matrix if format == "csr" else sparse.csc_matrix
+    expected = matrix[rows][:, cols].toarray()
+
+    np.testing.assert_array_equal(
+        submatrix(
+            (matrix.data[data_map], indices, indptr), shape=expected.shape
+        ).toarray(),
+        expected,
+    )
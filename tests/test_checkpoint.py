@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from fem_python.checkpoint import load_checkpoint, write_checkpoint
+from fem_python.mesh import make_structured_mesh
+from fem_python.simulation import Simulation
+
+
+def make_simulation(fem_mesh):
+    return Simulation(
+        fem_mesh,
+        material_model_name="nonlinear_elastic",
+        elasticity_module=1,
+        poission_ratio=0.3,
+        prescribed_displacement_x=0.3,
+        num_time_steps=3,
+        verbose=False,
+    )
+
+
+def test_checkpoint_is_loaded_by_the_same_mesh(tmp_path):
+    simulation = make_simulation(make_structured_mesh(4, 2))
+    simulation.reset()
+    simulation.step()
+    path = write_checkpoint(simulation, str(tmp_path))
+
+    restarted = make_simulation(make_structured_mesh(4, 2))
+    load_checkpoint(restarted, path)
+
+    assert restarted.time_step == simulation.time_step
+    np.testing.assert_array_equal(
+        restarted.total_displacement_vec, simulation.total_displacement_vec
+    )
+
+
+def test_checkpoint_of_a_different_mesh_with_the_same_size_raises(tmp_path):
+    simulation = make_simulation(make_structured_mesh(4, 2))
+    simulation.reset()
+    simulation.step()
+    path = write_checkpoint(simulation, str(tmp_path))
+
+    # The same number of nodes and elements, but other coordinates.
+    fem_mesh = make_structured_mesh(4, 2)
+    fem_mesh.node_coords = fem_mesh.node_coords * 2
+
+    with pytest.raises(ValueError):
+        load_checkpoint(make_simulation(fem_mesh), path)
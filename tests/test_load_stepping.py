@@ -0,0 +1,69 @@
+import numpy as np
+
+from fem_python.fem.load_stepping import AdaptiveLoadStepping
+from fem_python.mesh import make_structured_mesh
+from fem_python.simulation import ConvergenceError, Simulation
+
+
+def make_load_stepping():
+    return AdaptiveLoadStepping(
+        num_time_steps=2,
+        step_growth_factor=1.5,
+        step_cutback_factor=0.5,
+        fast_convergence_iterations=4,
+        min_load_factor_increment=1e-4,
+        max_load_factor_increment=0.5,
+    )
+
+
+def test_cut_back_starts_from_the_clamped_last_increment():
+    load_stepping = make_load_stepping()
+
+    # The last time step is clamped to what remains of the load path.
+    increment = load_stepping.get_increment(0.95)
+    assert np.isclose(increment, 0.05)
+
+    assert load_stepping.cut_back(increment)
+    assert np.isclose(load_stepping.get_increment(0.95), 0.025)
+
+
+def test_failure_on_the_clamped_last_time_step_is_not_retried_unchanged():
+    simulation = Simulation(
+        make_structured_mesh(4, 2),
+        material_model_name="nonlinear_elastic",
+        elasticity_module=1,
+        poission_ratio=0.3,
+        prescribed_displacement_x=0.3,
+        num_time_steps=20,
+        load_stepping_name="adaptive",
+        verbose=False,
+    )
+    simulation.load_stepping = make_load_stepping()
+
+    solve_time_step = simulation._solve_time_step
+    attempts = []
+
+    # The Newton method fails unless the time step is small.
+    def failing_solve_time_step(displacement_step_x):
+        load_factor_increment = (
+            displacement_step_x / simulation.prescribed_displacement_x
+        )
+        attempts.append(load_factor_increment)
+
+        if load_factor_increment > 0.03:
+            raise ConvergenceError("Newton method failed to converge")
+
+        return solve_time_step(displacement_step_x)
+
+    simulation._solve_time_step = failing_solve_time_step
+
+    # The simulation is at load factor 0.95 with a large increment, e.g. after a few fast time steps.
+    simulation.reset()
+    simulation.load_factor = 0.95
+    simulation.load_stepping.load_factor_increment = 0.5
+
+    simulation.step()
+
+    # The clamped increment 0.05 fails once, and is then cut back.
+    np.testing.assert_allclose(attempts, [0.05, 0.025])
+    assert np.isclose(simulation.load_factor, 0.975)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from fem_python.fem.material_model import AbstractMaterialModel, get_material_model
+from fem_python.fem.material_state import MaterialStateStore
+
+NUM_ELEMENTS = 2
+NUM_INTEGRATION_POINTS = 4
+
+
+def make_store(material, committed):
+    store = MaterialStateStore(
+        material.initial_state, NUM_ELEMENTS, NUM_INTEGRATION_POINTS
+    )
+    for name, value in committed.items():
+        store.committed[name][...] = value
+    return store
+
+
+@pytest.mark.parametrize("material_model_name", ["linear_elastic", "nonlinear_elastic"])
+def test_batched_functions_match_pointwise_fallback(material_model_name):
+    material = get_material_model(
+        material_model_name, elasticity_module=1, poission_ratio=0.3
+    )
+
+    rng = np.random.default_rng(0)
+    increment_strain = rng.uniform(
+        -0.1, 0.1, (NUM_ELEMENTS * NUM_INTEGRATION_POINTS, 3)
+    )
+
+    # The committed state is not zero, so that the functions have to read it.
+    committed = {
+        name: rng.uniform(
+            -0.1, 0.1, (NUM_ELEMENTS, NUM_INTEGRATION_POINTS) + np.shape(value)
+        )
+        for name, value in material.initial_state.items()
+    }
+
+    batched_store = make_store(material, committed)
+    pointwise_store = make_store(material, committed)
+
+    stiffness, stress = material.compute_stress_and_stiffness_batched(
+        increment_strain, batched_store.get_state(), batched_store.get_tmp_state()
+    )
+    pointwise_stiffness, pointwise_stress = (
+        AbstractMaterialModel.compute_stress_and_stiffness_batched(
+            material,
+            increment_strain,
+            pointwise_store.get_state(),
+            pointwise_store.get_tmp_state(),
+        )
+    )
+
+    assert np.allclose(stiffness, pointwise_stiffness)
+    assert np.allclose(stress, pointwise_stress)
+    for name, value in committed.items():
+        assert np.allclose(batched_store.trial[name], pointwise_store.trial[name])
+        assert np.array_equal(batched_store.committed[name], value)
+
+    batched_store = make_store(material, committed)
+    pointwise_store = make_store(material, committed)
+
+    stress_only = material.compute_stress_batched(
+        increment_strain, batched_store.get_state(), batched_store.get_tmp_state()
+    )
+    pointwise_stress_only = AbstractMaterialModel.compute_stress_batched(
+        material,
+        increment_strain,
+        pointwise_store.get_state(),
+        pointwise_store.get_tmp_state(),
+    )
+
+    assert np.allclose(stress_only, pointwise_stress_only)
+    assert np.allclose(stress_only, stress)
+    for name, value in committed.items():
+        assert np.allclose(batched_store.trial[name], pointwise_store.trial[name])
+        assert np.array_equal(batched_store.committed[name], value)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from fem_python.mesh.mesh_cache import read_mesh_arrays
+
+meshio = pytest.importorskip("meshio")
+
+
+def write_msh_file(path):
+    # One quad element with its 4 boundary lines.
+    points = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=float)
+    cells = [
+        ("line", np.array([[0, 1], [1, 2], [2, 3], [3, 0]])),
+        ("quad", np.array([[0, 1, 2, 3]])),
+    ]
+    tags = [np.array([1, 2, 3, 4]), np.array([5])]
+    meshio.write(
+        path,
+        meshio.Mesh(
+            points,
+            cells,
+            cell_data={"gmsh:physical": tags, "gmsh:geometrical": tags},
+        ),
+        file_format="gmsh22",
+        binary=False,
+    )
+
+
+def test_mesh_is_read_when_the_cache_cannot_be_written(tmp_path):
+    mesh_file_path = str(tmp_path / "mesh.msh")
+    write_msh_file(mesh_file_path)
+
+    # A file where the cache directory should be, so that it cannot be made.
+    with open(mesh_file_path + ".cache", "w"):
+        pass
+
+    with pytest.warns(UserWarning):
+        arrays = read_mesh_arrays(mesh_file_path)
+
+    np.testing.assert_array_equal(arrays["quad"], [[0, 1, 2, 3]])
+    np.testing.assert_array_equal(arrays["line_tags"], [1, 2, 3, 4])
+
+
+def test_cached_arrays_equal_the_parsed_ones(tmp_path):
+    mesh_file_path = str(tmp_path / "mesh.msh")
+    write_msh_file(mesh_file_path)
+
+    parsed = read_mesh_arrays(mesh_file_path)
+    cached = read_mesh_arrays(mesh_file_path)
+
+    assert isinstance(cached["node_coords"], np.memmap)
+    for name, value in parsed.items():
+        np.testing.assert_array_equal(cached[name], value)
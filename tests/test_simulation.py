@@ -0,0 +1,48 @@
+import numpy as np
+
+from fem_python.fem.material_model import (
+    AbstractMaterialModel,
+    NonelinearElasticMaterialModel,
+)
+from fem_python.mesh import make_structured_mesh
+from fem_python.simulation import Simulation
+
+
+class PointwiseNonlinearElasticMaterialModel(NonelinearElasticMaterialModel):
+    """The nonlinear elastic model without its vectorized functions, so that the points are
+    evaluated one by one, as for a material model that only implements the single point methods.
+    """
+
+    thread_safe = False
+    compute_stress_and_stiffness_batched = (
+        AbstractMaterialModel.compute_stress_and_stiffness_batched
+    )
+    compute_stress_batched = AbstractMaterialModel.compute_stress_batched
+
+
+def make_simulation(**kwargs):
+    return Simulation(
+        make_structured_mesh(4, 2),
+        material_model_name="nonlinear_elastic",
+        elasticity_module=1,
+        poission_ratio=0.3,
+        prescribed_displacement_x=0.3,
+        num_time_steps=3,
+        verbose=False,
+        **kwargs,
+    )
+
+
+def test_pointwise_material_runs_twice_from_the_undeformed_state():
+    simulation = make_simulation()
+    simulation.material = PointwiseNonlinearElasticMaterialModel(
+        elasticity_module=1, poission_ratio=0.3
+    )
+
+    first_forces = list(simulation.run()["force"])
+    second_forces = list(simulation.run()["force"])
+
+    np.testing.assert_allclose(second_forces, first_forces)
+
+    # The pointwise model gives the same result as the vectorized one.
+    np.testing.assert_allclose(first_forces, make_simulation().run()["force"])
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from fem_python import config
+from fem_python.fem.integration import get_gauss_integration_setting
+from fem_python.fem.material_model import get_material_model
+from fem_python.fem.material_state import MaterialStateStore
+from fem_python.fem.shape_functions import Q4ShapeFunction
+from fem_python.fem.stiffness_matrix import (
+    make_internal_force_vector,
+    make_stiffness_matrix_and_internal_force_vector,
+)
+from fem_python.mesh import FEMMesh, make_structured_mesh
+
+
+def make_distorted_mesh():
+    # The interior nodes are moved, so that the elements are not rectangles and the B matrices
+    # differ between the integration points and the elements.
+    structured_mesh = make_structured_mesh(4, 3)
+    node_coords = structured_mesh.node_coords.copy()
+
+    rng = np.random.default_rng(0)
+    x, y = node_coords.T
+    is_interior = (x > 0) & (x < 1) & (y > 0) & (y < 1)
+    node_coords[is_interior] += rng.uniform(-0.08, 0.08, (is_interior.sum(), 2))
+
+    return FEMMesh.from_arrays(
+        node_coords,
+        structured_mesh.connectivity_matrix,
+        structured_mesh.boundary_connectivity_matrices,
+    )
+
+
+def make_material_and_state(fem_mesh):
+    material = get_material_model(
+        "nonlinear_elastic", elasticity_module=1, poission_ratio=0.3
+    )
+    num_integration_points = len(
+        get_gauss_integration_setting(config.num_integration_points)
+    )
+    material_state = MaterialStateStore(
+        material.initial_state, fem_mesh.num_elements, num_integration_points
+    )
+
+    # The committed state is not zero, so that the assembly has to read it.
+    rng = np.random.default_rng(1)
+    for value in material_state.committed.values():
+        value[...] = rng.uniform(-0.05, 0.05, value.shape)
+
+    return material, material_state
+
+
+def assemble_reference(fem_mesh, increment_displacement_vec, material, material_state):
+    """Element by element, with the pointwise shape functions and material model, and np.ix_."""
+    num_dofs = fem_mesh.num_nodes * 2
+    stiffness_mat = np.zeros((num_dofs, num_dofs))
+    internal_force_vec = np.zeros((num_dofs,))
+
+    integration_points = get_gauss_integration_setting(config.num_integration_points)
+
+    for e, nodes in enumerate(fem_mesh.connectivity_matrix):
+        dofs = np.stack([2 * nodes, 2 * nodes + 1], axis=-1).ravel()
+        shape_function = Q4ShapeFunction(fem_mesh.node_coords[nodes])
+
+        element_stiffness_mat = np.zeros((8, 8))
+        element_internal_force = np.zeros((8,))
+        for g, integration_point in enumerate(integration_points):
+            b = shape_function.evaluate_b_at(integration_point.point)
+            volume = (
+                shape_function.evaluate_jacob_determinant_at(integration_point.point)
+                * integration_point.weight
+            )
+
+            material.state = {
+                name: value[e, g] for name, value in material_state.committed.items()
+            }
+            material_stiffness, stress = material.compute_stress_and_stiffness(
+                b @ increment_displacement_vec[dofs]
+            )
+
+            element_stiffness_mat += b.T @ material_stiffness @ b * volume
+            element_internal_force += b.T @ stress * volume
+
+        stiffness_mat[np.ix_(dofs, dofs)] += element_stiffness_mat
+        internal_force_vec[dofs] += element_internal_force
+
+    return stiffness_mat, internal_force_vec
+
+
+@pytest.mark.parametrize(
+    "assembly_mode, num_threads", [("sparse", 1), ("dense", 1), ("sparse", 3)]
+)
+def test_assembly_matches_element_by_element_reference(assembly_mode, num_threads):
+    fem_mesh = make_distorted_mesh()
+    material, material_state = make_material_and_state(fem_mesh)
+
+    rng = np.random.default_rng(2)
+    increment_displacement_vec = rng.uniform(-0.05, 0.05, fem_mesh.num_nodes * 2)
+
+    stiffness_mat, internal_force_vec = make_stiffness_matrix_and_internal_force_vector(
+        fem_mesh,
+        increment_displacement_vec,
+        material,
+        material_state,
+        assembly_mode=assembly_mode,
+        num_threads=num_threads,
+    )
+    reference_stiffness_mat, reference_internal_force_vec = assemble_reference(
+        fem_mesh, increment_displacement_vec, material, material_state
+    )
+
+    assert sparse.issparse(stiffness_mat) == (assembly_mode == "sparse")
+    if sparse.issparse(stiffness_mat):
+        stiffness_mat = stiffness_mat.toarray()
+
+    np.testing.assert_allclose(stiffness_mat, reference_stiffness_mat, atol=1e-12)
+    np.testing.assert_allclose(
+        internal_force_vec, reference_internal_force_vec, atol=1e-12
+    )
+
+    # The residual-only path gives the same internal force vector.
+    np.testing.assert_allclose(
+        make_internal_force_vector(
+            fem_mesh,
+            increment_displacement_vec,
+            material,
+            material_state,
+            num_threads=num_threads,
+        ),
+        reference_internal_force_vec,
+        atol=1e-12,
+    )
@@ -0,0 +1,47 @@
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fem_python import config
+from fem_python import sweep
+from fem_python.mesh import make_structured_mesh
+from fem_python.simulation import Simulation
+
+
+def test_spawned_workers_use_the_config_of_the_caller(tmp_path, monkeypatch):
+    # spawn imports the config module again in the workers, with its default values.
+    monkeypatch.setattr(
+        sweep,
+        "ProcessPoolExecutor",
+        functools.partial(
+            ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn")
+        ),
+    )
+    # plane_stress is not an argument of Simulation.
+    monkeypatch.setattr(config, "plane_stress", not config.plane_stress)
+
+    fem_mesh = make_structured_mesh(4, 2)
+    simulation_kwargs = dict(
+        material_model_name="linear_elastic",
+        elasticity_module=1,
+        prescribed_displacement_x=0.3,
+        num_time_steps=2,
+    )
+
+    output_path = sweep.run_sweep(
+        fem_mesh,
+        [{"poission_ratio": 0.3}],
+        str(tmp_path / "sweep.npz"),
+        num_workers=1,
+        **simulation_kwargs,
+    )
+
+    with np.load(output_path) as results:
+        swept_force = results["force"][0]
+
+    simulation = Simulation(
+        fem_mesh, poission_ratio=0.3, verbose=False, **simulation_kwargs
+    )
+    np.testing.assert_allclose(swept_force, simulation.run()["force"])
@@ -0,0 +1,77 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from fem_python.mesh import make_structured_mesh
+from fem_python.postprocess import XDMFTimeSeriesWriter
+
+h5py = pytest.importorskip("h5py")
+
+
+def read_in_other_process(h5_path, dataset_path):
+    # HDF5 locks a file per process, so the reader runs in another one, as ParaView would.
+    code = (
+        "import sys, h5py\n"
+        "with h5py.File(sys.argv[1], 'r') as f:\n"
+        "    print(f[sys.argv[2]][()].sum())\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code, str(h5_path), dataset_path],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(output.stdout)
+
+
+def test_steps_can_be_read_while_the_writer_is_open(tmp_path):
+    fem_mesh = make_structured_mesh(4, 2)
+    displacement = np.ones((fem_mesh.num_nodes, 2))
+
+    with XDMFTimeSeriesWriter(str(tmp_path / "out.xdmf"), fem_mesh) as writer:
+        writer.write_step(1, {"displacement": displacement})
+        assert read_in_other_process(
+            writer.h5_path, "step_000000/displacement"
+        ) == pytest.approx(displacement.sum())
+
+        writer.write_step(2, {"displacement": 2 * displacement})
+        assert read_in_other_process(
+            writer.h5_path, "step_000001/displacement"
+        ) == pytest.approx(2 * displacement.sum())
+
+    with h5py.File(writer.h5_path, "r") as f:
+        assert f["mesh/geometry"].shape == (fem_mesh.num_nodes, 2)
+        assert sorted(f) == ["mesh", "step_000000", "step_000001"]
+
+
+def test_restart_keeps_the_steps_up_to_the_checkpoint(tmp_path):
+    fem_mesh = make_structured_mesh(4, 2)
+    file_path = str(tmp_path / "out.xdmf")
+    displacement = np.ones((fem_mesh.num_nodes, 2))
+
+    with XDMFTimeSeriesWriter(file_path, fem_mesh) as writer:
+        for time in [1, 2, 3, 4]:
+            writer.write_step(time, {"displacement": time * displacement})
+
+    # The checkpoint is at time step 2, so the steps 3 and 4 are computed again.
+    with XDMFTimeSeriesWriter(file_path, fem_mesh, restart_time_step=2) as writer:
+        for time in [3, 4, 5]:
+            writer.write_step(time, {"displacement": -time * displacement})
+
+    with h5py.File(writer.h5_path, "r") as f:
+        steps = sorted(name for name in f if name != "mesh")
+        assert [f[name].attrs["time"] for name in steps] == [1, 2, 3, 4, 5]
+        assert [f[name]["displacement"][0, 0] for name in steps] == [1, 2, -3, -4, -5]
+
+    with open(file_path) as f:
+        assert f.read().count("<Time ") == 5
+
+
+def test_restart_with_a_different_mesh_raises(tmp_path):
+    file_path = str(tmp_path / "out.xdmf")
+    XDMFTimeSeriesWriter(file_path, make_structured_mesh(4, 2)).close()
+
+    with pytest.raises(ValueError):
+        XDMFTimeSeriesWriter(file_path, make_structured_mesh(2, 4), restart_time_step=2)